@@ -18,10 +18,14 @@ AZURE_DEVOPS_API_VERSION = os.getenv("AZURE_DEVOPS_API_VERSION", "7.0")  # Defau
 VECTOR_DB_TYPE = os.getenv("VECTOR_DB_TYPE", "weaviate")  # weaviate, qdrant, or faiss
 VECTOR_DB_URL = os.getenv("VECTOR_DB_URL")
 VECTOR_DB_API_KEY = os.getenv("VECTOR_DB_API_KEY", "")
+QDRANT_UPLOAD_PARALLEL = max(1, int(os.getenv("QDRANT_UPLOAD_PARALLEL", "4")))  # Parallel Qdrant upload workers for large uploads
 
 # Embedding Service Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))  # Max embeddings kept in memory; 0 disables the cache
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "int8")  # int8, float16, or float32
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "")  # Persist embeddings across restarts if set
 
 # LangGraph Agent Configuration
 AGENT_MODEL = os.getenv("AGENT_MODEL", "gpt-4o")
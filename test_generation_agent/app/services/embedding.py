@@ -3,11 +3,28 @@ Embedding service module.
 Handles text embedding generation using OpenAI's embedding models or Sentence Transformers.
 """
 import logging
-from typing import List, Union, Dict, Any
+from typing import List, Union, Dict, Any, Optional, Tuple
 import os
 import asyncio
+import random
+import hashlib
+import re
+import sqlite3
+import threading
+from collections import deque
+from pathlib import Path
+from functools import lru_cache
 
-from app.config import OPENAI_API_KEY, OPENAI_EMBEDDING_MODEL
+import numpy as np
+
+from app.config import (
+    OPENAI_API_KEY,
+    OPENAI_EMBEDDING_MODEL,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_DTYPE,
+    EMBEDDING_CACHE_DIR
+)
+from app.models.data_models import UserStoryRecord, TestCaseRecord
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -27,10 +44,480 @@ except ImportError:
 # Try to import Sentence Transformers as fallback
 try:
     from sentence_transformers import SentenceTransformer
-    model = None  # Will be lazy-loaded when needed
 except ImportError:
     logger.warning("Sentence Transformers package not installed. Need either OpenAI or Sentence Transformers.")
-    model = None
+
+# Default Sentence Transformers model used when OpenAI is unavailable
+SENTENCE_TRANSFORMER_MODEL = "all-MiniLM-L6-v2"
+
+@lru_cache(maxsize=None)
+def get_sentence_transformer(model_name: str = SENTENCE_TRANSFORMER_MODEL) -> "SentenceTransformer":
+    """
+    Load a Sentence Transformers model, reusing it across calls.
+    
+    Args:
+        model_name: Name of the Sentence Transformers model
+        
+    Returns:
+        SentenceTransformer: The loaded model
+    """
+    return SentenceTransformer(model_name)
+
+# Try to import xxhash for fast cache keys
+try:
+    import xxhash
+except ImportError:
+    logger.warning("xxhash package not installed. Falling back to hashlib for embedding cache keys.")
+    xxhash = None
+
+def _cache_key(text: str, namespace: str = "") -> bytes:
+    """
+    Compute a 128-bit digest of a text for use as a cache key.
+    
+    Long texts are hashed once here instead of on every dict lookup,
+    and the cache does not keep the original text alive.
+    
+    Args:
+        text: The text to hash
+        namespace: Prefix that separates keys of different embedding models
+        
+    Returns:
+        bytes: 16-byte digest of the namespace and text
+    """
+    data = f"{namespace}\0{text}".encode("utf-8") if namespace else text.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class EmbeddingCache:
+    """
+    In-memory cache for text embeddings.
+    
+    Embeddings are stored as rows of a single matrix, with a dict mapping
+    each text digest to its row. By default rows are quantized to int8 with
+    a per-vector scale, which is a quarter of the size of float32 and loses
+    well under 1% of cosine similarity for text embeddings. float16 and
+    float32 storage are also supported.
+    
+    Uses sampled LRU eviction: when the cache is full, a handful of random
+    rows are sampled and the least recently used of them is evicted.
+    This avoids reordering a linked list on every cache hit.
+    
+    If cache_dir is set, embeddings are also written through to a SQLite
+    file as float16, so they survive process restarts and are not paid
+    for twice. Keys include the namespace, so entries written for another
+    embedding model are never returned.
+    
+    A max_size of 0 or less disables the cache: lookups always miss and
+    nothing is stored.
+    """
+    
+    def __init__(
+        self,
+        max_size: int = 1024,
+        sample_size: int = 8,
+        dtype: Union[str, type] = np.int8,
+        cache_dir: Optional[str] = None,
+        namespace: str = ""
+    ):
+        self.max_size = max(max_size, 0)
+        self.enabled = self.max_size > 0
+        self.namespace = namespace
+        self.sample_size = sample_size
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.int8, np.float16, np.float32):
+            raise ValueError(f"Unsupported embedding cache dtype: {self.dtype}")
+        self.quantize = self.dtype == np.int8
+        # Allocated on the first insert, once the embedding dimension is known
+        self.matrix: Optional[np.ndarray] = None
+        self.scales = np.ones(self.max_size, dtype=np.float32)
+        self.last_used = np.zeros(self.max_size, dtype=np.int64)
+        # text digest -> row in self.matrix
+        self.index: Dict[bytes, int] = {}
+        self.row_keys: List[Optional[bytes]] = [None] * self.max_size
+        self.free_rows = deque(range(self.max_size))
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        # Guards the index, matrix and counters when shared across threads
+        self.lock = threading.Lock()
+        # Serializes use of the SQLite connection, so disk writes don't hold up memory lookups
+        self.disk_lock = threading.Lock()
+        self.disk = self._open_disk_cache(cache_dir) if cache_dir and self.enabled else None
+    
+    def _open_disk_cache(self, cache_dir: str) -> Optional[sqlite3.Connection]:
+        """
+        Open (creating if needed) the on-disk embedding store.
+        
+        Args:
+            cache_dir: Directory to keep the cache file in
+            
+        Returns:
+            Optional[sqlite3.Connection]: The connection, or None if it could not be opened
+        """
+        try:
+            path = Path(cache_dir)
+            path.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(path / "embeddings.sqlite"), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # A lost write only costs a re-embed, so don't fsync on every commit
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            connection.commit()
+            return connection
+        except Exception as e:
+            logger.error(f"Error opening embedding disk cache in {cache_dir}: {e}", exc_info=True)
+            return None
+    
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Get the cached embedding for a text.
+        
+        Args:
+            text: The text that was embedded
+            
+        Returns:
+            Optional[List[float]]: The cached embedding, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        key = _cache_key(text, self.namespace)
+        cached = self._get_from_memory(key)
+        if cached is not None:
+            return cached
+        return self._promote_from_disk(key, self._load_from_disk([key])[0])
+    
+    async def aget_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Get the cached embeddings for several texts without blocking the event loop.
+        
+        Memory lookups run inline; texts missing from memory are looked up
+        on disk with a single call in a worker thread.
+        
+        Args:
+            texts: The texts that were embedded
+            
+        Returns:
+            List[Optional[List[float]]]: The cached embedding of each text, or None on a miss
+        """
+        if not self.enabled:
+            return [None] * len(texts)
+        
+        keys = [_cache_key(text, self.namespace) for text in texts]
+        results = [self._get_from_memory(key) for key in keys]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if not missing:
+            return results
+        
+        missing_keys = [keys[i] for i in missing]
+        if self.disk is None:
+            loaded = [None] * len(missing_keys)
+        else:
+            loop = asyncio.get_running_loop()
+            loaded = await loop.run_in_executor(None, self._load_from_disk, missing_keys)
+        for i, key, vector in zip(missing, missing_keys, loaded):
+            results[i] = self._promote_from_disk(key, vector)
+        return results
+    
+    def _get_from_memory(self, key: bytes) -> Optional[List[float]]:
+        """
+        Look up a key in the in-memory matrix, counting a hit if found.
+        
+        Args:
+            key: Digest of the embedded text
+            
+        Returns:
+            Optional[List[float]]: The cached embedding, or None if not in memory
+        """
+        with self.lock:
+            row = self.index.get(key)
+            if row is None:
+                return None
+            
+            self.hits += 1
+            self.clock += 1
+            self.last_used[row] = self.clock
+            if self.quantize:
+                vector = self.matrix[row].astype(np.float32) * self.scales[row]
+            else:
+                vector = self.matrix[row].astype(np.float32)
+        return vector.tolist()
+    
+    def _promote_from_disk(self, key: bytes, vector: Optional[np.ndarray]) -> Optional[List[float]]:
+        """
+        Record the outcome of a disk lookup, keeping found entries in memory.
+        
+        Args:
+            key: Digest of the embedded text
+            vector: The vector loaded from disk, or None if it was not stored
+            
+        Returns:
+            Optional[List[float]]: The embedding, or None on a miss
+        """
+        with self.lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            
+            # Promote the disk entry into memory for the next lookup
+            self.hits += 1
+            self._store(key, vector)
+        return vector.tolist()
+    
+    def get_int8(self, text: str) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Get the raw quantized embedding for a text.
+        
+        Lets similarity code work on the int8 values directly, e.g. with
+        an int32-accumulated dot product, without dequantizing first.
+        
+        Args:
+            text: The text that was embedded
+            
+        Returns:
+            Optional[Tuple[np.ndarray, float]]: The int8 vector and its scale,
+            or None on a miss or when quantization is disabled
+        """
+        if not self.quantize or not self.enabled:
+            return None
+        
+        key = _cache_key(text, self.namespace)
+        with self.lock:
+            row = self.index.get(key)
+            if row is None:
+                return None
+            return self.matrix[row].copy(), float(self.scales[row])
+    
+    def set(self, text: str, embedding: Union[List[float], np.ndarray]) -> None:
+        """
+        Store an embedding in the cache, evicting an entry if it is full.
+        
+        Args:
+            text: The text that was embedded
+            embedding: The embedding vector
+        """
+        self.set_many([(text, embedding)])
+    
+    def set_many(self, items: List[Tuple[str, Union[List[float], np.ndarray]]]) -> None:
+        """
+        Store several embeddings, writing them to disk in one transaction.
+        
+        Args:
+            items: The embedded texts and their embedding vectors
+        """
+        entries = self._store_many(items)
+        if entries:
+            self._save_to_disk(entries)
+    
+    async def aset_many(self, items: List[Tuple[str, Union[List[float], np.ndarray]]]) -> None:
+        """
+        Store several embeddings without blocking the event loop.
+        
+        The in-memory insert runs inline; the disk write runs in a worker thread.
+        
+        Args:
+            items: The embedded texts and their embedding vectors
+        """
+        entries = self._store_many(items)
+        if entries and self.disk is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._save_to_disk, entries)
+    
+    def _store_many(self, items: List[Tuple[str, Union[List[float], np.ndarray]]]) -> List[Tuple[bytes, np.ndarray]]:
+        """
+        Store several embeddings in the in-memory matrix.
+        
+        Args:
+            items: The embedded texts and their embedding vectors
+            
+        Returns:
+            List[Tuple[bytes, np.ndarray]]: The stored keys and float32 vectors
+        """
+        if not self.enabled:
+            return []
+        
+        entries = [
+            (_cache_key(text, self.namespace), np.asarray(embedding, dtype=np.float32))
+            for text, embedding in items
+        ]
+        with self.lock:
+            for key, vector in entries:
+                self._store(key, vector)
+        return entries
+    
+    def _store(self, key: bytes, vector: np.ndarray) -> None:
+        """
+        Store a vector in the in-memory matrix.
+        
+        Args:
+            key: Digest of the embedded text
+            vector: The float32 embedding vector
+        """
+        if self.matrix is None or self.matrix.shape[1] != vector.shape[0]:
+            if self.matrix is not None:
+                logger.warning(
+                    f"Embedding dimension changed from {self.matrix.shape[1]} to {vector.shape[0]}, clearing cache"
+                )
+                self._reset_rows()
+            self.matrix = np.empty((self.max_size, vector.shape[0]), dtype=self.dtype)
+        
+        self.clock += 1
+        row = self.index.get(key)
+        if row is None:
+            if not self.free_rows:
+                self._evict()
+            row = self.free_rows.popleft()
+            self.index[key] = row
+            self.row_keys[row] = key
+        
+        if self.quantize:
+            max_abs = float(np.abs(vector).max()) if vector.size else 0.0
+            scale = max_abs / 127 if max_abs > 0 else 1.0
+            self.matrix[row] = np.round(vector / scale).astype(np.int8)
+            self.scales[row] = scale
+        else:
+            self.matrix[row] = vector
+        self.last_used[row] = self.clock
+    
+    def _load_from_disk(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        Load vectors from the on-disk store.
+        
+        Args:
+            keys: Digests of the embedded texts
+            
+        Returns:
+            List[Optional[np.ndarray]]: The float32 vector for each key, or None if not stored
+        """
+        if self.disk is None:
+            return [None] * len(keys)
+        
+        try:
+            with self.disk_lock:
+                rows = [
+                    self.disk.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    for key in keys
+                ]
+        except sqlite3.Error as e:
+            logger.error(f"Error reading embedding disk cache: {e}")
+            return [None] * len(keys)
+        return [
+            np.frombuffer(row[0], dtype=np.float16).astype(np.float32) if row is not None else None
+            for row in rows
+        ]
+    
+    def _save_to_disk(self, entries: List[Tuple[bytes, np.ndarray]]) -> None:
+        """
+        Write vectors through to the on-disk store as float16, in one commit.
+        
+        Args:
+            entries: Digest of each embedded text and its float32 embedding vector
+        """
+        if self.disk is None:
+            return
+        
+        try:
+            with self.disk_lock:
+                self.disk.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.astype(np.float16).tobytes()) for key, vector in entries]
+                )
+                self.disk.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing embedding disk cache: {e}")
+    
+    def _evict(self) -> None:
+        """Evict the least recently used row out of a random sample."""
+        # Eviction only happens when every row is in use
+        if self.max_size <= self.sample_size:
+            victim = int(np.argmin(self.last_used))
+        else:
+            rows = random.sample(range(self.max_size), self.sample_size)
+            victim = min(rows, key=lambda row: self.last_used[row])
+        
+        del self.index[self.row_keys[victim]]
+        self.row_keys[victim] = None
+        self.free_rows.append(victim)
+    
+    def _reset_rows(self) -> None:
+        """Mark every row of the matrix as free."""
+        self.index.clear()
+        self.row_keys = [None] * self.max_size
+        self.free_rows = deque(range(self.max_size))
+        self.last_used.fill(0)
+    
+    def clear(self) -> None:
+        """Remove all in-memory entries and reset the statistics."""
+        with self.lock:
+            self._reset_rows()
+            self.hits = 0
+            self.misses = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dict[str, Any]: Size, capacity, hits, misses and hit rate
+        """
+        with self.lock:
+            hits, misses, size = self.hits, self.misses, len(self.index)
+        total = hits + misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0
+        }
+
+# Maximum number of texts sent in a single OpenAI embeddings request
+EMBEDDING_BATCH_SIZE = 256
+
+# Maximum number of OpenAI embeddings requests in flight at once
+MAX_CONCURRENT_EMBEDDING_BATCHES = 5
+
+# Texts outside this length range are rarely repeated, so they bypass the cache
+MIN_CACHEABLE_TEXT_LENGTH = 16
+MAX_CACHEABLE_TEXT_LENGTH = 8192
+
+# Bump when the text normalization or stored vector format changes,
+# so embeddings cached by an older version are no longer used
+EMBEDDING_CACHE_VERSION = 1
+
+def embedding_model_fingerprint() -> str:
+    """
+    Identify the embedding model and cache format used for cache keys.
+    
+    Returns:
+        str: The configured model ID and cache version
+    """
+    if has_openai and client:
+        model_id = f"openai/{OPENAI_EMBEDDING_MODEL}"
+    else:
+        model_id = f"sentence-transformers/{SENTENCE_TRANSFORMER_MODEL}"
+    return f"{model_id}|v{EMBEDDING_CACHE_VERSION}"
+
+# Shared cache used by get_embedding
+embedding_cache = EmbeddingCache(
+    max_size=EMBEDDING_CACHE_SIZE,
+    dtype=EMBEDDING_CACHE_DTYPE,
+    cache_dir=EMBEDDING_CACHE_DIR or None,
+    namespace=embedding_model_fingerprint()
+)
+
+def is_cacheable(text: str) -> bool:
+    """
+    Check whether a text should go through the embedding cache.
+    
+    Args:
+        text: The text to embed
+        
+    Returns:
+        bool: True if the text length is within the cacheable range
+    """
+    return MIN_CACHEABLE_TEXT_LENGTH <= len(text) <= MAX_CACHEABLE_TEXT_LENGTH
 
 async def get_embedding(text: str) -> List[float]:
     """
@@ -44,18 +531,32 @@ async def get_embedding(text: str) -> List[float]:
     """
     if not text:
         raise ValueError("Cannot embed empty text")
+    
+    # Return the cached embedding if we have already embedded this text
+    cacheable = is_cacheable(text)
+    if cacheable:
+        cached, = await embedding_cache.aget_many([text])
+        if cached is not None:
+            return cached
         
     # Try OpenAI first if available
+    fell_back = False
     if has_openai and client:
         try:
-            return await get_openai_embedding(text)
+            embedding = await get_openai_embedding(text)
         except Exception as e:
             logger.error(f"Error using OpenAI embedding: {e}")
             # Fall back to Sentence Transformers
-            return await get_sentence_transformer_embedding(text)
+            embedding = await get_sentence_transformer_embedding(text)
+            fell_back = True
     else:
         # Use Sentence Transformers directly
-        return await get_sentence_transformer_embedding(text)
+        embedding = await get_sentence_transformer_embedding(text)
+    
+    # The cache is keyed by the configured model, so fallback vectors stay out of it
+    if cacheable and not fell_back:
+        await embedding_cache.aset_many([(text, embedding)])
+    return embedding
 
 async def get_openai_embedding(text: str) -> List[float]:
     """
@@ -87,18 +588,10 @@ async def get_sentence_transformer_embedding(text: str) -> List[float]:
     Returns:
         List[float]: The embedding vector
     """
-    global model
-    
     try:
-        # Lazy-load the model when first needed
-        if model is None:
-            # Use a separate thread for loading the model
-            loop = asyncio.get_event_loop()
-            model = await loop.run_in_executor(None, lambda: SentenceTransformer('all-MiniLM-L6-v2'))
-            
-        # Run the model in a separate thread
+        # Load (on first use) and run the model in a separate thread
         loop = asyncio.get_event_loop()
-        embedding = await loop.run_in_executor(None, lambda: model.encode(text).tolist())
+        embedding = await loop.run_in_executor(None, lambda: get_sentence_transformer().encode(text).tolist())
         return embedding
     except Exception as e:
         logger.error(f"Error getting Sentence Transformer embedding: {e}", exc_info=True)
@@ -108,6 +601,9 @@ async def batch_get_embeddings(texts: List[str]) -> List[List[float]]:
     """
     Get embeddings for multiple texts in a batch.
     
+    Texts that are already cached are served from the cache, and only the
+    remaining unique texts are sent to the embedding backend.
+    
     Args:
         texts: List of texts to embed
         
@@ -122,31 +618,183 @@ async def batch_get_embeddings(texts: List[str]) -> List[List[float]]:
     
     if not valid_texts:
         return []
+    
+    # Serve cached texts and group the rest so duplicates are embedded once
+    embeddings: List[Optional[List[float]]] = [None] * len(valid_texts)
+    missing: Dict[str, List[int]] = {}
+    cacheable = [i for i, text in enumerate(valid_texts) if is_cacheable(text)]
+    cached = await embedding_cache.aget_many([valid_texts[i] for i in cacheable])
+    for i, embedding in zip(cacheable, cached):
+        embeddings[i] = embedding
+    for i, text in enumerate(valid_texts):
+        if embeddings[i] is None:
+            missing.setdefault(text, []).append(i)
+    
+    if missing:
+        missing_texts = list(missing)
+        computed, fell_back = await compute_batch_embeddings(missing_texts)
+        for text, embedding in zip(missing_texts, computed):
+            for i in missing[text]:
+                embeddings[i] = embedding
+        
+        # The cache is keyed by the configured model, so fallback vectors stay out of it.
+        # All new entries are written to disk in a single transaction.
+        if not fell_back:
+            await embedding_cache.aset_many([
+                (text, embedding)
+                for text, embedding in zip(missing_texts, computed)
+                if is_cacheable(text)
+            ])
+    
+    return embeddings
+
+async def compute_batch_embeddings(texts: List[str]) -> Tuple[List[List[float]], bool]:
+    """
+    Embed texts with the configured backend, bypassing the cache.
+    
+    Args:
+        texts: List of non-empty texts to embed
         
+    Returns:
+        Tuple[List[List[float]], bool]: List of embedding vectors, and whether
+        they came from the Sentence Transformers fallback instead of OpenAI
+    """
     # Use OpenAI batch API if available
+    fell_back = False
     if has_openai and client:
         try:
-            response = await client.embeddings.create(
-                model=OPENAI_EMBEDDING_MODEL,
-                input=valid_texts
-            )
-            return [item.embedding for item in response.data]
+            return await get_openai_batch_embeddings(texts), False
         except Exception as e:
             logger.error(f"Error getting batch OpenAI embeddings: {e}", exc_info=True)
             # Fall back to Sentence Transformers
+            fell_back = True
     
     # Use Sentence Transformers
-    global model
     try:
-        # Lazy-load the model when first needed
-        if model is None:
-            loop = asyncio.get_event_loop()
-            model = await loop.run_in_executor(None, lambda: SentenceTransformer('all-MiniLM-L6-v2'))
-            
-        # Run the model in a separate thread
+        # Load (on first use) and run the model in a separate thread
         loop = asyncio.get_event_loop()
-        embeddings = await loop.run_in_executor(None, lambda: model.encode(valid_texts).tolist())
-        return embeddings
+        embeddings = await loop.run_in_executor(None, lambda: get_sentence_transformer().encode(texts).tolist())
+        return embeddings, fell_back
     except Exception as e:
         logger.error(f"Error getting batch Sentence Transformer embeddings: {e}", exc_info=True)
         raise
+
+async def warmup_embedding_cache(texts: List[str]) -> int:
+    """
+    Pre-populate the embedding cache, e.g. with frequently seen stories.
+    
+    Args:
+        texts: Texts to embed ahead of time
+        
+    Returns:
+        int: Number of cached embeddings afterwards
+    """
+    await batch_get_embeddings(texts)
+    return embedding_cache.get_stats()["size"]
+
+async def get_openai_batch_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Get embeddings for many texts using the OpenAI API.
+    
+    Texts are split into requests of EMBEDDING_BATCH_SIZE, and at most
+    MAX_CONCURRENT_EMBEDDING_BATCHES requests are in flight at once, with
+    jittered starts so queued requests don't hit the rate limit together.
+    
+    Args:
+        texts: The texts to embed
+        
+    Returns:
+        List[List[float]]: The embedding vectors, in the same order as texts
+    """
+    chunks = [texts[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_EMBEDDING_BATCHES)
+    
+    async def embed_chunk(chunk: List[str]) -> List[List[float]]:
+        async with semaphore:
+            if len(chunks) > 1:
+                await asyncio.sleep(random.random() * 0.05)
+            response = await client.embeddings.create(
+                model=OPENAI_EMBEDDING_MODEL,
+                input=chunk
+            )
+            return [item.embedding for item in response.data]
+    
+    results = await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks))
+    return [embedding for chunk_embeddings in results for embedding in chunk_embeddings]
+
+# Runs of whitespace, collapsed before embedding
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse runs of whitespace into single spaces.
+    
+    Indentation and blank lines from multi-line descriptions carry no
+    meaning for the embedding, and removing them lets otherwise identical
+    texts share a cache entry.
+    
+    Args:
+        text: The text to normalize
+        
+    Returns:
+        str: The normalized text
+    """
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def format_user_story_text(story: UserStoryRecord) -> str:
+    """
+    Build the text that is embedded for a user story.
+    
+    Args:
+        story: The user story
+        
+    Returns:
+        str: Normalized title and description separated by a blank line
+    """
+    return "\n\n".join((normalize_text(story.title), normalize_text(story.description)))
+
+def format_test_case_text(test_case: TestCaseRecord) -> str:
+    """
+    Build the text that is embedded for a test case.
+    
+    Args:
+        test_case: The test case
+        
+    Returns:
+        str: Normalized title, description and markdown text separated by blank lines
+    """
+    return "\n\n".join((
+        normalize_text(test_case.title),
+        normalize_text(test_case.description),
+        normalize_text(test_case.test_case_text)
+    ))
+
+async def embed_user_stories(stories: List[UserStoryRecord]) -> List[UserStoryRecord]:
+    """
+    Embed multiple user stories with a single batch request.
+    
+    Args:
+        stories: The user stories to embed; their embedding field is set in place
+        
+    Returns:
+        List[UserStoryRecord]: The same user stories, with embeddings
+    """
+    embeddings = await batch_get_embeddings([format_user_story_text(story) for story in stories])
+    for story, embedding in zip(stories, embeddings):
+        story.embedding = embedding
+    return stories
+
+async def embed_test_cases(test_cases: List[TestCaseRecord]) -> List[TestCaseRecord]:
+    """
+    Embed multiple test cases with a single batch request.
+    
+    Args:
+        test_cases: The test cases to embed; their embedding field is set in place
+        
+    Returns:
+        List[TestCaseRecord]: The same test cases, with embeddings
+    """
+    embeddings = await batch_get_embeddings([format_test_case_text(test_case) for test_case in test_cases])
+    for test_case, embedding in zip(test_cases, embeddings):
+        test_case.embedding = embedding
+    return test_cases
@@ -7,7 +7,7 @@ from typing import Dict, Any, List, Optional
 import asyncio
 
 from app.models.data_models import UserStoryWebhook, AgentInput, AgentOutput, UserStoryRecord, TestCaseRecord
-from app.services.embedding import get_embedding
+from app.services.embedding import get_embedding, format_user_story_text
 from app.services.vector_store import (
     store_user_story, 
     store_test_cases, 
@@ -50,9 +50,7 @@ async def process_user_story(user_story: UserStoryWebhook) -> Dict[str, Any]:
         
         # Get embedding for the user story
         # TODO: Uncomment when embedding service is implemented
-        # story_record.embedding = await get_embedding(
-        #     f"{story_record.title}\n\n{story_record.description}"
-        # )
+        # story_record.embedding = await get_embedding(format_user_story_text(story_record))
         
         # For now, mock the embedding as a list of 1536 zeros
         story_record.embedding = [0.0] * 1536
@@ -62,9 +60,12 @@ async def process_user_story(user_story: UserStoryWebhook) -> Dict[str, Any]:
         # await store_user_story(story_record)
         
         # Search for similar user stories and test cases
+        # The two searches are independent, so run them concurrently
         # TODO: Uncomment when vector store is implemented
-        # similar_stories = await search_similar_user_stories(story_record.embedding, limit=3)
-        # similar_test_cases = await search_similar_test_cases(story_record.embedding, limit=5)
+        # similar_stories, similar_test_cases = await asyncio.gather(
+        #     search_similar_user_stories(story_record.embedding, limit=3),
+        #     search_similar_test_cases(story_record.embedding, limit=5)
+        # )
         
         # For now, mock the similar stories and test cases
         similar_stories = []
@@ -2,34 +2,171 @@
 Vector store service.
 Handles storage and retrieval of user stories and test cases in a vector database.
 """
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Union
+from functools import lru_cache, partial
+from typing import List, Dict, Any, Optional, Union, Tuple
 import json
 import os
+import threading
+import time
 import uuid
+from operator import itemgetter
 
-from app.config import get_vector_db_credentials, VECTOR_DB_TYPE
+import numpy as np
+
+from app.config import get_vector_db_credentials, VECTOR_DB_TYPE, QDRANT_UPLOAD_PARALLEL
 from app.models.data_models import UserStoryRecord, TestCaseRecord, VectorSearchResult
+from app.services.embedding import embed_user_stories, embed_test_cases, embedding_model_fingerprint
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Stored fields returned by similarity searches (everything except the embedding)
+_USER_STORY_FIELDS = ("story_id", "project_id", "title", "description", "created_at")
+_TEST_CASE_FIELDS = (
+    "story_id", "test_case_id", "title", "description",
+    "test_case_text", "test_case_csv", "steps", "generated_at"
+)
+_get_user_story_fields = itemgetter(*_USER_STORY_FIELDS)
+_get_test_case_fields = itemgetter(*_TEST_CASE_FIELDS)
+
+# Try to import orjson for faster (de)serialization of test case steps
+try:
+    import orjson
+except ImportError:
+    logger.warning("orjson package not installed. Falling back to json for test case steps.")
+    orjson = None
+
+def _dumps_step(step: Dict[str, Any]) -> str:
+    """
+    Serialize a test case step to a JSON string.
+    
+    Args:
+        step: The step to serialize
+        
+    Returns:
+        str: The step as a JSON string
+    """
+    if orjson is not None:
+        return orjson.dumps(step).decode("utf-8")
+    return json.dumps(step)
+
+def _loads_step(step: str) -> Dict[str, Any]:
+    """
+    Parse a test case step from a JSON string.
+    
+    Args:
+        step: The JSON string to parse
+        
+    Returns:
+        Dict[str, Any]: The parsed step
+    """
+    if orjson is not None:
+        return orjson.loads(step)
+    return json.loads(step)
+
+@lru_cache(maxsize=1024)
+def _parse_steps(steps: Tuple[str, ...]) -> Tuple[Dict[str, Any], ...]:
+    """
+    Parse the JSON-encoded steps of a test case returned by Weaviate.
+    
+    The same test cases tend to come back for many similar stories, so parsed
+    steps are cached. Records copy the step dicts during validation, so the
+    cached values are never modified.
+    
+    Args:
+        steps: The steps as JSON strings
+        
+    Returns:
+        Tuple[Dict[str, Any], ...]: The parsed steps
+    """
+    return tuple(_loads_step(step) for step in steps)
+
+# Clients already created in this process, keyed by (url, api_key)
+_qdrant_client_pool: Dict[tuple, Any] = {}
+_weaviate_client_pool: Dict[tuple, Any] = {}
+
+# Qdrant gRPC port; gRPC sends vectors as binary protobuf instead of JSON text
+QDRANT_GRPC_PORT = 6334
+
+# Request timeouts in seconds
+QDRANT_TIMEOUT = 30
+WEAVIATE_CONNECT_TIMEOUT = 10
+WEAVIATE_READ_TIMEOUT = 60
+
+def get_qdrant_client(url: str, api_key: Optional[str] = None):
+    """
+    Get a Qdrant client for the given server, reusing an existing one if possible.
+    
+    Args:
+        url: URL of the Qdrant server
+        api_key: Optional API key
+        
+    Returns:
+        A shared QdrantClient instance
+    """
+    key = (url, api_key)
+    client = _qdrant_client_pool.get(key)
+    if client is None:
+        from qdrant_client import QdrantClient
+        
+        client = QdrantClient(
+            url=url,
+            api_key=api_key,
+            grpc_port=QDRANT_GRPC_PORT,
+            prefer_grpc=True,
+            timeout=QDRANT_TIMEOUT
+        )
+        _qdrant_client_pool[key] = client
+    return client
+
+def get_weaviate_client(url: str, api_key: Optional[str] = None):
+    """
+    Get a Weaviate client for the given server, reusing an existing one if possible.
+    
+    Args:
+        url: URL of the Weaviate server
+        api_key: Optional API key
+        
+    Returns:
+        A shared weaviate.Client instance
+    """
+    key = (url, api_key)
+    client = _weaviate_client_pool.get(key)
+    if client is None:
+        import weaviate
+        from weaviate.auth import AuthApiKey
+        
+        auth_config = AuthApiKey(api_key=api_key) if api_key else None
+        client = weaviate.Client(
+            url=url,
+            auth_client_secret=auth_config,
+            timeout_config=(WEAVIATE_CONNECT_TIMEOUT, WEAVIATE_READ_TIMEOUT)
+        )
+        _weaviate_client_pool[key] = client
+    return client
+
 # Initialize vector DB client
+# The client is created once at import and shared by every function below,
+# so HTTP keep-alive connections are reused instead of reconnecting per call.
 vector_db_client = None
 vector_db_config = get_vector_db_credentials()
 
+# Normalize the backend type once so every call can dispatch on it directly
+vector_db_config["type"] = vector_db_config["type"].lower()
+
 # Try to initialize the appropriate vector DB client
 try:
-    if vector_db_config["type"].lower() == "weaviate":
+    if vector_db_config["type"] in ["weaviate", "qdrant"] and not vector_db_config["url"]:
+        logger.warning(f"VECTOR_DB_URL not configured. {vector_db_config['type']} client will not be initialized.")
+        
+    elif vector_db_config["type"] == "weaviate":
         try:
-            import weaviate
-            from weaviate.auth import AuthApiKey
-            
-            # Initialize Weaviate client
-            auth_config = AuthApiKey(api_key=vector_db_config["api_key"]) if vector_db_config["api_key"] else None
-            vector_db_client = weaviate.Client(
-                url=vector_db_config["url"],
-                auth_client_secret=auth_config
+            vector_db_client = get_weaviate_client(
+                vector_db_config["url"],
+                vector_db_config["api_key"] or None
             )
             logger.info("Weaviate client initialized successfully")
         except ImportError:
@@ -37,15 +174,11 @@ try:
         except Exception as e:
             logger.error(f"Error initializing Weaviate client: {e}", exc_info=True)
             
-    elif vector_db_config["type"].lower() == "qdrant":
+    elif vector_db_config["type"] == "qdrant":
         try:
-            from qdrant_client import QdrantClient
-            from qdrant_client.http import models
-            
-            # Initialize Qdrant client
-            vector_db_client = QdrantClient(
-                url=vector_db_config["url"],
-                api_key=vector_db_config["api_key"] if vector_db_config["api_key"] else None
+            vector_db_client = get_qdrant_client(
+                vector_db_config["url"],
+                vector_db_config["api_key"] or None
             )
             logger.info("Qdrant client initialized successfully")
         except ImportError:
@@ -53,10 +186,9 @@ try:
         except Exception as e:
             logger.error(f"Error initializing Qdrant client: {e}", exc_info=True)
     
-    elif vector_db_config["type"].lower() == "faiss":
+    elif vector_db_config["type"] == "faiss":
         try:
             import faiss
-            import numpy as np
             
             # Initialize FAISS index (in-memory for now)
             # This is a simplified implementation for demo purposes
@@ -78,20 +210,412 @@ try:
 except Exception as e:
     logger.error(f"Error initializing vector store: {e}", exc_info=True)
 
-# Helper function to create schema if needed
-async def ensure_schema_exists():
+async def _run_blocking(func, *args, **kwargs):
     """
-    Ensure that the necessary schema/collections exist in the vector DB.
-    This is called on startup or when first needed.
+    Run a blocking vector DB client call in a worker thread.
+    
+    The Qdrant and Weaviate clients are synchronous. Calling them directly
+    would block the event loop, so calls gathered with asyncio.gather would
+    still run one after the other.
+    
+    Args:
+        func: The client method to call
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+        
+    Returns:
+        Any: The return value of func
     """
-    if vector_db_client is None:
-        logger.error("Vector DB client not initialized")
-        return False
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+# HNSW graph parameters shared by all backends, tuned for 1536-dim embeddings
+HNSW_M = 32
+HNSW_EF_CONSTRUCT = 256
+
+# Candidate list size explored per query; higher improves recall at the cost of latency
+HNSW_EF_SEARCH = 64
+
+# Vector index settings for Weaviate classes, matching the parameters above
+WEAVIATE_VECTOR_INDEX_CONFIG = {
+    "maxConnections": HNSW_M,
+    "efConstruction": HNSW_EF_CONSTRUCT,
+    "ef": HNSW_EF_SEARCH
+}
+
+# Candidates fetched per requested result when searching quantized vectors;
+# they are rescored with the original float32 vectors before the top results are returned
+QDRANT_RESCORE_OVERSAMPLING = 2.0
+
+def _qdrant_search_params():
+    """
+    Build the search parameters used for Qdrant similarity searches.
+    
+    Returns:
+        models.SearchParams: Parameters for rescoring quantized search results
+    """
+    from qdrant_client.http import models
+    
+    return models.SearchParams(
+        hnsw_ef=HNSW_EF_SEARCH,
+        quantization=models.QuantizationSearchParams(
+            rescore=True,
+            oversampling=QDRANT_RESCORE_OVERSAMPLING
+        )
+    )
+
+# Number of points sent per request when uploading to Qdrant
+QDRANT_UPLOAD_BATCH_SIZE = 256
+
+def _qdrant_point_id(key: str) -> int:
+    """
+    Derive a stable Qdrant point ID from a record key.
+    
+    Qdrant only accepts unsigned integers or UUIDs as point IDs, so string keys
+    are hashed with uuid5. The same key always maps to the same point, which
+    makes re-storing a record an overwrite instead of a duplicate.
+    
+    Args:
+        key: The record key, e.g. a story ID
+        
+    Returns:
+        int: A 64-bit point ID
+    """
+    return uuid.uuid5(uuid.NAMESPACE_URL, key).int >> 64
+
+def _test_case_key(test_case: TestCaseRecord) -> str:
+    """
+    Get the key a test case is stored under.
+    
+    Args:
+        test_case: The test case
+        
+    Returns:
+        str: The test case ID, or the story ID and title if it has none
+    """
+    return test_case.test_case_id or f"{test_case.story_id}/{test_case.title}"
+
+# Fields left out of a record's content fingerprint; timestamps change on
+# every ingestion run even when the content itself is unchanged
+_FINGERPRINT_EXCLUDED_FIELDS = {"embedding", "created_at", "generated_at"}
+
+def _record_fingerprint(record: Union[UserStoryRecord, TestCaseRecord]) -> str:
+    """
+    Compute a fingerprint of a record's content and embedding model.
+    
+    The embedding model is part of the fingerprint, so records stored with
+    another model's vectors are never treated as unchanged.
+    
+    Args:
+        record: The user story or test case
         
+    Returns:
+        str: Hex SHA-256 digest of the record's content and embedding model
+    """
+    content = record.dict(exclude=_FINGERPRINT_EXCLUDED_FIELDS)
+    content["embedding_model"] = embedding_model_fingerprint()
+    return hashlib.sha256(json.dumps(content, default=str, sort_keys=True).encode()).hexdigest()
+
+def _skip_unchanged_qdrant_records(collection_name: str, records: List[Any], keys: List[str]) -> List[Any]:
+    """
+    Drop records whose content is already stored in a Qdrant collection.
+    
+    Each stored point carries its record's fingerprint in the "content_fp"
+    payload field, so a single retrieve call tells which records are unchanged.
+    Skipping them avoids re-embedding and re-uploading identical content.
+    
+    Args:
+        collection_name: Name of the Qdrant collection
+        records: The records about to be stored
+        keys: The key of each record
+        
+    Returns:
+        List[Any]: The records that are new or have changed
+    """
+    point_ids = [_qdrant_point_id(key) for key in keys]
+    existing = vector_db_client.retrieve(
+        collection_name=collection_name,
+        ids=point_ids,
+        with_payload=["content_fp"],
+        with_vectors=False
+    )
+    stored_fingerprints = {point.id: (point.payload or {}).get("content_fp") for point in existing}
+    
+    changed = [
+        record
+        for record, point_id in zip(records, point_ids)
+        if stored_fingerprints.get(point_id) != _record_fingerprint(record)
+    ]
+    if len(changed) < len(records):
+        logger.info(f"Skipping {len(records) - len(changed)} unchanged records in Qdrant collection {collection_name}")
+    return changed
+
+def _qdrant_points(records: List[Any], keys: List[str]) -> List[Any]:
+    """
+    Build Qdrant points for records that have an embedding.
+    
+    Args:
+        records: The user stories or test cases
+        keys: The key of each record
+        
+    Returns:
+        List[Any]: The points, carrying each record's content fingerprint
+    """
+    from qdrant_client.http import models
+    
+    return [
+        models.PointStruct(
+            id=_qdrant_point_id(key),
+            vector=record.embedding,
+            payload={**record.dict(exclude={"embedding"}), "content_fp": _record_fingerprint(record)}
+        )
+        for record, key in zip(records, keys)
+        if record.embedding
+    ]
+
+def _upload_qdrant_points(collection_name: str, points: List[Any], wait: bool = True) -> None:
+    """
+    Upload points to a Qdrant collection in batches.
+    
+    Args:
+        collection_name: Name of the Qdrant collection
+        points: The points to upload
+        wait: Return only once the points are applied, so they are visible to
+            searches right away. Bulk loads skip this and wait for indexing instead
+    """
+    # Parallel workers only pay off once there is more than one batch to send
+    parallel = QDRANT_UPLOAD_PARALLEL if len(points) > QDRANT_UPLOAD_BATCH_SIZE else 1
+    vector_db_client.upload_points(
+        collection_name=collection_name,
+        points=points,
+        batch_size=QDRANT_UPLOAD_BATCH_SIZE,
+        parallel=parallel,
+        wait=wait
+    )
+
+# Qdrant optimizer threshold restored after a bulk load (Qdrant's default)
+QDRANT_INDEXING_THRESHOLD = 20000
+
+# How long to wait for Qdrant to finish indexing after a bulk load, in seconds
+QDRANT_INDEXING_TIMEOUT = 300
+QDRANT_INDEXING_POLL_INTERVAL = 0.5
+
+def _set_qdrant_indexing(collection_name: str, enabled: bool, include_graph: bool = True) -> None:
+    """
+    Enable or disable HNSW indexing on a Qdrant collection.
+    
+    Args:
+        collection_name: Name of the Qdrant collection
+        enabled: Whether points should be indexed as they arrive
+        include_graph: Also switch the HNSW graph itself off (m=0) and back on.
+            Changing m rebuilds the graph, so this is only worth it for empty collections
+    """
+    from qdrant_client.http import models
+    
+    vector_db_client.update_collection(
+        collection_name=collection_name,
+        optimizer_config=models.OptimizersConfigDiff(
+            indexing_threshold=QDRANT_INDEXING_THRESHOLD if enabled else 0
+        ),
+        hnsw_config=models.HnswConfigDiff(m=HNSW_M if enabled else 0) if include_graph else None
+    )
+
+def _qdrant_collection_is_empty(collection_name: str) -> bool:
+    """
+    Check whether a Qdrant collection holds no points yet.
+    
+    Args:
+        collection_name: Name of the Qdrant collection
+        
+    Returns:
+        bool: True if the collection is empty
+    """
+    return vector_db_client.count(collection_name=collection_name, exact=False).count == 0
+
+async def _wait_for_qdrant_green(collection_name: str) -> bool:
+    """
+    Wait until a Qdrant collection has finished optimizing.
+    
+    Args:
+        collection_name: Name of the Qdrant collection
+        
+    Returns:
+        bool: True if the collection turned green before the timeout
+    """
+    from qdrant_client.http import models
+    
+    deadline = time.monotonic() + QDRANT_INDEXING_TIMEOUT
+    while time.monotonic() < deadline:
+        collection = await _run_blocking(vector_db_client.get_collection, collection_name)
+        if collection.status == models.CollectionStatus.GREEN:
+            return True
+        await asyncio.sleep(QDRANT_INDEXING_POLL_INTERVAL)
+        
+    logger.warning(f"Qdrant collection {collection_name} is still indexing after {QDRANT_INDEXING_TIMEOUT}s")
+    return False
+
+# Weaviate batch settings; dynamic batching adapts the size to server latency
+WEAVIATE_BATCH_SIZE = 100
+WEAVIATE_BATCH_WORKERS = 4
+
+# A Weaviate v3 client has a single batch object whose buffer and executor are
+# shared by every caller, so only one batch may be open at a time
+_weaviate_batch_lock = threading.Lock()
+
+def _weaviate_object_id(key: str) -> str:
+    """
+    Derive a stable Weaviate object UUID from a record key.
+    
+    Weaviate batch imports overwrite objects with an existing UUID, so
+    re-storing a record updates it instead of adding a duplicate.
+    
+    Args:
+        key: The record key, e.g. a story ID
+        
+    Returns:
+        str: A uuid5 string
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+def _weaviate_batch(callback):
+    """
+    Get the Weaviate batch manager configured for bulk imports.
+    
+    Args:
+        callback: Called with the results of every flushed batch request
+        
+    Returns:
+        The client's batch manager, to be used as a context manager
+    """
+    return vector_db_client.batch.configure(
+        batch_size=WEAVIATE_BATCH_SIZE,
+        dynamic=True,
+        num_workers=WEAVIATE_BATCH_WORKERS,
+        callback=callback
+    )
+
+def _add_weaviate_objects(
+    class_name: str,
+    objects: List[Tuple[Dict[str, Any], str, List[float]]]
+) -> List[Dict[str, Any]]:
+    """
+    Send objects to Weaviate through a single batch.
+    
+    Concurrent callers take turns, because they would otherwise share the
+    client's batch buffer and executor.
+    
+    Args:
+        class_name: The Weaviate class to add the objects to
+        objects: The data object, UUID and vector of each object
+        
+    Returns:
+        List[Dict[str, Any]]: The errors Weaviate reported for rejected objects
+    """
+    errors = []
+    
+    # The client's default callback only prints rejected objects, so collect them instead
+    def collect_errors(results: Optional[List[Dict[str, Any]]]) -> None:
+        for result in results or []:
+            object_errors = result.get("result", {}).get("errors")
+            if object_errors:
+                errors.append(object_errors)
+    
+    with _weaviate_batch_lock, _weaviate_batch(collect_errors) as batch:
+        for data_object, object_id, vector in objects:
+            batch.add_data_object(
+                data_object=data_object,
+                class_name=class_name,
+                uuid=object_id,
+                vector=vector
+            )
+    return errors
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale each row of a float32 matrix to unit length.
+    
+    The FAISS indices use inner product, which equals cosine similarity on
+    unit vectors, so the norms are paid once at insert/query time rather than
+    inside every distance computation.
+    
+    Args:
+        vectors: Matrix with one vector per row
+        
+    Returns:
+        np.ndarray: The normalized vectors
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+def _create_faiss_index(dimension: int):
+    """
+    Create an HNSW FAISS index that ranks unit vectors by inner product.
+    
+    Args:
+        dimension: Dimension of the vectors
+        
+    Returns:
+        faiss.IndexHNSWFlat: The empty index
+    """
+    import faiss
+    
+    index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCT
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+# Seconds a successful schema check is trusted before the DB is asked again
+SCHEMA_CHECK_TTL = 60.0
+
+# Client whose schema was last verified, and the monotonic time it was verified
+_schema_checked_client = None
+_schema_checked_at = 0.0
+
+# Keeps concurrent callers from listing and creating the schema at the same time.
+# asyncio locks belong to one event loop, so a new lock is made for each loop.
+_schema_lock: Optional[asyncio.Lock] = None
+_schema_lock_loop = None
+
+def _get_schema_lock() -> asyncio.Lock:
+    """
+    Get the schema check lock for the running event loop.
+    
+    Returns:
+        asyncio.Lock: The lock
+    """
+    global _schema_lock, _schema_lock_loop
+    
+    loop = asyncio.get_running_loop()
+    if _schema_lock_loop is not loop:
+        _schema_lock = asyncio.Lock()
+        _schema_lock_loop = loop
+    return _schema_lock
+
+def _schema_is_fresh() -> bool:
+    """
+    Check whether the schema of the current client was verified recently.
+    
+    Returns:
+        bool: True if the last successful check is younger than SCHEMA_CHECK_TTL
+    """
+    return (
+        _schema_checked_client is vector_db_client
+        and time.monotonic() - _schema_checked_at < SCHEMA_CHECK_TTL
+    )
+
+async def _check_schema() -> bool:
+    """
+    Create any missing classes or collections and record the successful check.
+    
+    Returns:
+        bool: True if the schema exists, False otherwise
+    """
+    global _schema_checked_client, _schema_checked_at
+    
     try:
-        if vector_db_config["type"].lower() == "weaviate":
+        if vector_db_config["type"] == "weaviate":
             # Check if classes exist, create them if they don't
-            schema = vector_db_client.schema.get()
+            schema = await _run_blocking(vector_db_client.schema.get)
             
             # Create UserStory class if it doesn't exist
             if not any(cls["class"] == "UserStory" for cls in schema["classes"]):
@@ -99,6 +623,8 @@ async def ensure_schema_exists():
                     "class": "UserStory",
                     "description": "User story from Azure DevOps",
                     "vectorizer": "none",  # We provide embeddings directly
+                    "vectorIndexType": "hnsw",
+                    "vectorIndexConfig": WEAVIATE_VECTOR_INDEX_CONFIG,
                     "properties": [
                         {"name": "story_id", "dataType": ["string"]},
                         {"name": "project_id", "dataType": ["string"]},
@@ -107,7 +633,7 @@ async def ensure_schema_exists():
                         {"name": "created_at", "dataType": ["date"]}
                     ]
                 }
-                vector_db_client.schema.create_class(class_obj)
+                await _run_blocking(vector_db_client.schema.create_class, class_obj)
                 logger.info("Created UserStory class in Weaviate")
                 
             # Create TestCase class if it doesn't exist
@@ -116,6 +642,8 @@ async def ensure_schema_exists():
                     "class": "TestCase",
                     "description": "Test case generated for a user story",
                     "vectorizer": "none",  # We provide embeddings directly
+                    "vectorIndexType": "hnsw",
+                    "vectorIndexConfig": WEAVIATE_VECTOR_INDEX_CONFIG,
                     "properties": [
                         {"name": "story_id", "dataType": ["string"]},
                         {"name": "test_case_id", "dataType": ["string"]},
@@ -127,51 +655,95 @@ async def ensure_schema_exists():
                         {"name": "generated_at", "dataType": ["date"]}
                     ]
                 }
-                vector_db_client.schema.create_class(class_obj)
+                await _run_blocking(vector_db_client.schema.create_class, class_obj)
                 logger.info("Created TestCase class in Weaviate")
                 
-        elif vector_db_config["type"].lower() == "qdrant":
+        elif vector_db_config["type"] == "qdrant":
             from qdrant_client.http import models
             
             # Create user_stories collection if it doesn't exist
-            collections = vector_db_client.get_collections().collections
+            collections = (await _run_blocking(vector_db_client.get_collections)).collections
             collection_names = [c.name for c in collections]
             
+            # Store an int8 copy of every vector in RAM for search; the float32
+            # originals are kept for rescoring the top candidates
+            quantization_config = models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+            hnsw_config = models.HnswConfigDiff(
+                m=HNSW_M,
+                ef_construct=HNSW_EF_CONSTRUCT,
+                on_disk=False
+            )
+            
             if "user_stories" not in collection_names:
-                vector_db_client.create_collection(
+                await _run_blocking(
+                    vector_db_client.create_collection,
                     collection_name="user_stories",
                     vectors_config=models.VectorParams(
                         size=1536,  # Default for OpenAI embeddings
                         distance=models.Distance.COSINE
-                    )
+                    ),
+                    hnsw_config=hnsw_config,
+                    quantization_config=quantization_config
                 )
                 logger.info("Created user_stories collection in Qdrant")
                 
             if "test_cases" not in collection_names:
-                vector_db_client.create_collection(
+                await _run_blocking(
+                    vector_db_client.create_collection,
                     collection_name="test_cases",
                     vectors_config=models.VectorParams(
                         size=1536,  # Default for OpenAI embeddings
                         distance=models.Distance.COSINE
-                    )
+                    ),
+                    hnsw_config=hnsw_config,
+                    quantization_config=quantization_config
                 )
                 logger.info("Created test_cases collection in Qdrant")
                 
-        elif vector_db_config["type"].lower() == "faiss":
+        elif vector_db_config["type"] == "faiss":
             # For FAISS, we'll just initialize the index if it doesn't exist
             if vector_db_client["index"] is None:
-                import faiss
                 vector_db_client["index"] = {
-                    "user_stories": faiss.IndexFlatL2(vector_db_client["dimension"]),
-                    "test_cases": faiss.IndexFlatL2(vector_db_client["dimension"])
+                    "user_stories": _create_faiss_index(vector_db_client["dimension"]),
+                    "test_cases": _create_faiss_index(vector_db_client["dimension"])
                 }
                 logger.info("Initialized FAISS indices")
-                
+        
+        _schema_checked_client = vector_db_client
+        _schema_checked_at = time.monotonic()
         return True
     except Exception as e:
         logger.error(f"Error ensuring schema exists: {e}", exc_info=True)
         return False
 
+# Helper function to create schema if needed
+async def ensure_schema_exists():
+    """
+    Ensure that the necessary schema/collections exist in the vector DB.
+    This is called on startup or when first needed.
+    
+    Every store and search calls this, so a successful check is cached for
+    SCHEMA_CHECK_TTL seconds instead of listing the schema on each request.
+    """
+    if vector_db_client is None:
+        logger.error("Vector DB client not initialized")
+        return False
+    
+    if _schema_is_fresh():
+        return True
+        
+    async with _get_schema_lock():
+        # Another caller may have finished the check while this one waited
+        if _schema_is_fresh():
+            return True
+        return await _check_schema()
+
 # Store a user story in the vector DB
 async def store_user_story(story: UserStoryRecord) -> bool:
     """
@@ -190,70 +762,111 @@ async def store_user_story(story: UserStoryRecord) -> bool:
     if not story.embedding:
         logger.error("User story embedding is missing")
         return False
+    
+    return await store_user_stories([story])
+
+# Store multiple user stories in the vector DB
+async def store_user_stories(stories: List[UserStoryRecord], skip_unchanged: bool = False) -> bool:
+    """
+    Store multiple user stories in the vector database in a single batch.
+    
+    Stories without an embedding are embedded together in one batch request.
+    
+    Args:
+        stories: The user stories to store
+        skip_unchanged: On Qdrant, look up the stored stories first and skip
+            those whose content is unchanged; meant for repeated ingestion runs
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    if vector_db_client is None:
+        logger.error("Vector DB client not initialized")
+        return False
+        
+    if not stories:
+        logger.warning("No user stories to store")
+        return True
         
     try:
         # Ensure schema exists
         await ensure_schema_exists()
         
-        if vector_db_config["type"].lower() == "weaviate":
-            # Convert to Weaviate format
-            story_dict = story.dict()
-            
-            # Extract the embedding
-            embedding = story_dict.pop("embedding")
-            
-            # Add the story to Weaviate
-            vector_db_client.data_object.create(
-                class_name="UserStory",
-                data_object=story_dict,
-                vector=embedding
+        # Content already stored in Qdrant doesn't need to be embedded or uploaded again
+        if skip_unchanged and vector_db_config["type"] == "qdrant":
+            stories = await _run_blocking(
+                _skip_unchanged_qdrant_records,
+                "user_stories", stories, [story.story_id for story in stories]
             )
-            logger.info(f"Stored user story {story.story_id} in Weaviate")
+        
+        # Embed any stories that don't have an embedding yet in one batch call
+        missing_embeddings = [story for story in stories if not story.embedding]
+        if missing_embeddings:
+            await embed_user_stories(missing_embeddings)
+        
+        # Skip stories that still have no embedding
+        valid_stories = []
+        for story in stories:
+            if not story.embedding:
+                logger.warning(f"User story {story.story_id} has no embedding, skipping")
+                continue
+            valid_stories.append(story)
+        
+        if not valid_stories:
+            return True
+        
+        if vector_db_config["type"] == "weaviate":
+            # Collect all stories and send them in a single batch request
+            objects = []
+            for story in valid_stories:
+                # Convert to Weaviate format
+                story_dict = story.dict()
+                
+                # Extract the embedding
+                embedding = story_dict.pop("embedding")
+                
+                objects.append((story_dict, _weaviate_object_id(story.story_id), embedding))
+            errors = await _run_blocking(_add_weaviate_objects, "UserStory", objects)
+            if errors:
+                logger.error(f"Weaviate rejected {len(errors)} of {len(objects)} user stories: {errors}")
+                return False
+            logger.info(f"Stored {len(valid_stories)} user stories in Weaviate")
             
-        elif vector_db_config["type"].lower() == "qdrant":
-            from qdrant_client.http import models
+        elif vector_db_config["type"] == "qdrant":
+            points = _qdrant_points(valid_stories, [story.story_id for story in valid_stories])
+            await _run_blocking(_upload_qdrant_points, "user_stories", points)
+            logger.info(f"Stored {len(points)} user stories in Qdrant")
             
-            # Add the story to Qdrant
-            vector_db_client.upsert(
-                collection_name="user_stories",
-                points=[
-                    models.PointStruct(
-                        id=story.story_id,
-                        vector=story.embedding,
-                        payload=story.dict(exclude={"embedding"})
-                    )
-                ]
+        elif vector_db_config["type"] == "faiss":
+            # Convert embeddings to a single numpy array
+            embeddings_np = _normalize_rows(
+                np.array([story.embedding for story in valid_stories], dtype=np.float32)
             )
-            logger.info(f"Stored user story {story.story_id} in Qdrant")
-            
-        elif vector_db_config["type"].lower() == "faiss":
-            import numpy as np
-            
-            # Convert embedding to numpy array
-            embedding_np = np.array([story.embedding], dtype=np.float32)
             
             # Add to FAISS index
             index = vector_db_client["index"]["user_stories"]
-            index.add(embedding_np)
+            index.add(embeddings_np)
             
             # Store the story data (excluding embedding)
-            story_id = story.story_id
-            vector_db_client["user_stories"][story_id] = story.dict(exclude={"embedding"})
+            for story in valid_stories:
+                vector_db_client["user_stories"][story.story_id] = story.dict(exclude={"embedding"})
             
-            logger.info(f"Stored user story {story.story_id} in FAISS")
+            logger.info(f"Stored {len(valid_stories)} user stories in FAISS")
             
         return True
     except Exception as e:
-        logger.error(f"Error storing user story: {e}", exc_info=True)
+        logger.error(f"Error storing user stories: {e}", exc_info=True)
         return False
 
 # Store test cases in the vector DB
-async def store_test_cases(test_cases: List[TestCaseRecord]) -> bool:
+async def store_test_cases(test_cases: List[TestCaseRecord], skip_unchanged: bool = False) -> bool:
     """
     Store test cases in the vector database.
     
     Args:
         test_cases: List of test cases to store
+        skip_unchanged: On Qdrant, look up the stored test cases first and skip
+            those whose content is unchanged; meant for repeated ingestion runs
         
     Returns:
         bool: True if successful, False otherwise
@@ -270,7 +883,9 @@ async def store_test_cases(test_cases: List[TestCaseRecord]) -> bool:
         # Ensure schema exists
         await ensure_schema_exists()
         
-        if vector_db_config["type"].lower() == "weaviate":
+        if vector_db_config["type"] == "weaviate":
+            # Collect all test cases and send them in a single batch request
+            objects = []
             for test_case in test_cases:
                 # Skip if embedding is missing
                 if not test_case.embedding:
@@ -282,50 +897,38 @@ async def store_test_cases(test_cases: List[TestCaseRecord]) -> bool:
                 
                 # Convert steps to list of strings for Weaviate
                 if "steps" in test_case_dict and test_case_dict["steps"]:
-                    test_case_dict["steps"] = [json.dumps(step) for step in test_case_dict["steps"]]
+                    test_case_dict["steps"] = [_dumps_step(step) for step in test_case_dict["steps"]]
                 
                 # Extract the embedding
                 embedding = test_case_dict.pop("embedding")
                 
-                # Add the test case to Weaviate
-                vector_db_client.data_object.create(
-                    class_name="TestCase",
-                    data_object=test_case_dict,
-                    vector=embedding
-                )
-                logger.info(f"Stored test case '{test_case.title}' in Weaviate")
+                objects.append((test_case_dict, _weaviate_object_id(_test_case_key(test_case)), embedding))
             
-        elif vector_db_config["type"].lower() == "qdrant":
-            from qdrant_client.http import models
+            if objects:
+                errors = await _run_blocking(_add_weaviate_objects, "TestCase", objects)
+                if errors:
+                    logger.error(f"Weaviate rejected {len(errors)} of {len(objects)} test cases: {errors}")
+                    return False
+            logger.info(f"Stored {len(objects)} test cases in Weaviate")
+            
+        elif vector_db_config["type"] == "qdrant":
+            # Content already stored in Qdrant doesn't need to be uploaded again
+            if skip_unchanged:
+                test_cases = await _run_blocking(
+                    _skip_unchanged_qdrant_records,
+                    "test_cases", test_cases, [_test_case_key(test_case) for test_case in test_cases]
+                )
             
-            points = []
             for test_case in test_cases:
-                # Skip if embedding is missing
                 if not test_case.embedding:
                     logger.warning(f"Test case {test_case.title} has no embedding, skipping")
-                    continue
-                
-                # Generate a unique ID if test_case_id is not provided
-                test_case_id = test_case.test_case_id or f"tc-{uuid.uuid4()}"
-                
-                points.append(
-                    models.PointStruct(
-                        id=test_case_id,
-                        vector=test_case.embedding,
-                        payload=test_case.dict(exclude={"embedding"})
-                    )
-                )
             
+            points = _qdrant_points(test_cases, [_test_case_key(test_case) for test_case in test_cases])
             if points:
-                vector_db_client.upsert(
-                    collection_name="test_cases",
-                    points=points
-                )
+                await _run_blocking(_upload_qdrant_points, "test_cases", points)
                 logger.info(f"Stored {len(points)} test cases in Qdrant")
             
-        elif vector_db_config["type"].lower() == "faiss":
-            import numpy as np
-            
+        elif vector_db_config["type"] == "faiss":
             # Collect embeddings for FAISS
             embeddings = []
             for i, test_case in enumerate(test_cases):
@@ -345,7 +948,7 @@ async def store_test_cases(test_cases: List[TestCaseRecord]) -> bool:
             
             if embeddings:
                 # Convert embeddings to numpy array
-                embeddings_np = np.array(embeddings, dtype=np.float32)
+                embeddings_np = _normalize_rows(np.array(embeddings, dtype=np.float32))
                 
                 # Add to FAISS index
                 index = vector_db_client["index"]["test_cases"]
@@ -358,16 +961,156 @@ async def store_test_cases(test_cases: List[TestCaseRecord]) -> bool:
         logger.error(f"Error storing test cases: {e}", exc_info=True)
         return False
 
+# Number of records embedded and uploaded per step of a bulk load pipeline;
+# one upload batch per worker, so each chunk is sent with parallel workers
+BULK_LOAD_CHUNK_SIZE = QDRANT_UPLOAD_BATCH_SIZE * QDRANT_UPLOAD_PARALLEL
+
+# Embedded chunks allowed to wait for upload before embedding pauses
+BULK_LOAD_QUEUE_SIZE = 4
+
+async def _embed_and_upload(collection_name: str, records: List[Any], keys: List[str], embed) -> None:
+    """
+    Embed records and upload them to Qdrant chunk by chunk.
+    
+    A producer embeds chunks while a consumer uploads the chunks that are
+    already embedded, so embedding and network uploads overlap instead of
+    running one after the other. The bounded queue keeps the producer from
+    running far ahead of the uploads.
+    
+    Args:
+        collection_name: Name of the Qdrant collection
+        records: The user stories or test cases to store
+        keys: The key of each record
+        embed: Coroutine function that embeds a list of records in place
+    """
+    queue = asyncio.Queue(maxsize=BULK_LOAD_QUEUE_SIZE)
+    
+    async def produce():
+        try:
+            for start in range(0, len(records), BULK_LOAD_CHUNK_SIZE):
+                chunk = records[start:start + BULK_LOAD_CHUNK_SIZE]
+                missing_embeddings = [record for record in chunk if not record.embedding]
+                if missing_embeddings:
+                    await embed(missing_embeddings)
+                await queue.put((chunk, keys[start:start + BULK_LOAD_CHUNK_SIZE]))
+        except Exception:
+            # Let the consumer stop before the error is re-raised below
+            await queue.put(None)
+            raise
+        await queue.put(None)
+    
+    loop = asyncio.get_running_loop()
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await queue.get()) is not None:
+            points = _qdrant_points(*item)
+            if points:
+                # Upload in a worker thread so the producer keeps embedding meanwhile
+                upload = loop.run_in_executor(
+                    None, partial(_upload_qdrant_points, collection_name, points, wait=False)
+                )
+                try:
+                    await asyncio.shield(upload)
+                except asyncio.CancelledError:
+                    # The upload thread can't be interrupted, so wait for it before giving up
+                    await asyncio.wait({upload})
+                    raise
+        await producer
+    finally:
+        producer.cancel()
+
+# Bulk load user stories and test cases
+async def bulk_load(stories: List[UserStoryRecord], test_cases: List[TestCaseRecord]) -> bool:
+    """
+    Store a large number of user stories and test cases at once.
+    
+    On Qdrant, unchanged records are skipped, and the rest are embedded and
+    uploaded in an overlapping pipeline. Indexing is switched off on the
+    collections that receive points and switched back on afterwards, so the
+    graph is updated once instead of on every batch. Empty collections also
+    get their HNSW graph switched off; collections that already hold data
+    keep theirs. Other backends store the records as usual.
+    
+    Args:
+        stories: The user stories to store
+        test_cases: The test cases to store
+        
+    Returns:
+        bool: True if successful and indexing finished in time, False otherwise
+    """
+    if vector_db_config["type"] != "qdrant":
+        stories_stored = await store_user_stories(stories)
+        test_cases_stored = await store_test_cases(test_cases)
+        return stories_stored and test_cases_stored
+        
+    if vector_db_client is None:
+        logger.error("Vector DB client not initialized")
+        return False
+        
+    try:
+        await ensure_schema_exists()
+        
+        stories = await _run_blocking(
+            _skip_unchanged_qdrant_records,
+            "user_stories", stories, [story.story_id for story in stories]
+        )
+        test_cases = await _run_blocking(
+            _skip_unchanged_qdrant_records,
+            "test_cases", test_cases, [_test_case_key(test_case) for test_case in test_cases]
+        )
+        
+        # Only collections that receive points need their indexing touched
+        uploads = {
+            "user_stories": (stories, [story.story_id for story in stories], embed_user_stories),
+            "test_cases": (test_cases, [_test_case_key(test_case) for test_case in test_cases], embed_test_cases)
+        }
+        uploads = {name: upload for name, upload in uploads.items() if upload[0]}
+        if not uploads:
+            logger.info("Nothing to bulk load into Qdrant, all records are unchanged")
+            return True
+        
+        include_graph = {
+            name: await _run_blocking(_qdrant_collection_is_empty, name)
+            for name in uploads
+        }
+        for name in uploads:
+            await _run_blocking(_set_qdrant_indexing, name, False, include_graph[name])
+        pipelines = [
+            asyncio.create_task(_embed_and_upload(name, records, keys, embed))
+            for name, (records, keys, embed) in uploads.items()
+        ]
+        try:
+            await asyncio.gather(*pipelines)
+        except BaseException:
+            # Stop the other pipeline before indexing is switched back on
+            for pipeline in pipelines:
+                pipeline.cancel()
+            await asyncio.gather(*pipelines, return_exceptions=True)
+            raise
+        finally:
+            for name in uploads:
+                await _run_blocking(_set_qdrant_indexing, name, True, include_graph[name])
+                
+        indexed = [await _wait_for_qdrant_green(name) for name in uploads]
+        if not all(indexed):
+            return False
+            
+        logger.info(f"Bulk loaded {len(stories)} user stories and {len(test_cases)} test cases into Qdrant")
+        return True
+    except Exception as e:
+        logger.error(f"Error bulk loading into Qdrant: {e}", exc_info=True)
+        return False
+
 # Search for similar user stories
 async def search_similar_user_stories(
-    embedding: List[float], 
+    embedding: Union[List[float], np.ndarray], 
     limit: int = 3
 ) -> List[UserStoryRecord]:
     """
     Search for similar user stories in the vector database.
     
     Args:
-        embedding: The query embedding
+        embedding: The query embedding, as a list or float32 array
         limit: Maximum number of results to return
         
     Returns:
@@ -377,29 +1120,30 @@ async def search_similar_user_stories(
         logger.error("Vector DB client not initialized")
         return []
         
-    if not embedding:
+    if embedding is None or len(embedding) == 0:
         logger.error("Query embedding is missing")
         return []
+    
+    # Keep the query as a float32 array and only convert at the wire boundary
+    query_vector = np.asarray(embedding, dtype=np.float32)
         
     try:
         # Ensure schema exists
         await ensure_schema_exists()
         
-        if vector_db_config["type"].lower() == "weaviate":
-            import weaviate.classes as wvc
-            
+        if vector_db_config["type"] == "weaviate":
             # Search for similar user stories
             query = (
                 vector_db_client.query
-                .get("UserStory", ["story_id", "project_id", "title", "description", "created_at"])
+                .get("UserStory", list(_USER_STORY_FIELDS))
                 .with_near_vector({
-                    "vector": embedding,
+                    "vector": query_vector.tolist(),
                 })
                 .with_limit(limit)
             )
             
             # Execute the query
-            result = query.do()
+            result = await _run_blocking(query.do)
             
             # Convert to UserStoryRecord objects
             user_stories = []
@@ -409,45 +1153,40 @@ async def search_similar_user_stories(
             logger.info(f"Found {len(user_stories)} similar user stories in Weaviate")
             return user_stories
             
-        elif vector_db_config["type"].lower() == "qdrant":
-            from qdrant_client.http import models
-            
+        elif vector_db_config["type"] == "qdrant":
             # Search for similar user stories
-            search_result = vector_db_client.search(
+            search_result = await _run_blocking(
+                vector_db_client.search,
                 collection_name="user_stories",
-                query_vector=embedding,
-                limit=limit
+                query_vector=query_vector,
+                limit=limit,
+                with_payload=list(_USER_STORY_FIELDS),
+                search_params=_qdrant_search_params()
             )
             
             # Convert to UserStoryRecord objects
-            user_stories = []
-            for item in search_result:
-                user_story_data = item.payload
-                user_story_data["embedding"] = None  # Embedding is not returned by Qdrant
-                user_stories.append(UserStoryRecord(**user_story_data))
+            # Embedding is not returned by Qdrant, so it is left at its default of None
+            user_stories = [
+                UserStoryRecord(**dict(zip(_USER_STORY_FIELDS, _get_user_story_fields(item.payload))))
+                for item in search_result
+            ]
                 
             logger.info(f"Found {len(user_stories)} similar user stories in Qdrant")
             return user_stories
             
-        elif vector_db_config["type"].lower() == "faiss":
-            import numpy as np
-            
-            # Convert query to numpy array
-            query_vector = np.array([embedding], dtype=np.float32)
-            
+        elif vector_db_config["type"] == "faiss":
             # Search the index
             index = vector_db_client["index"]["user_stories"]
-            D, I = index.search(query_vector, limit)
+            D, I = index.search(_normalize_rows(query_vector.reshape(1, -1)), limit)
             
             # Convert indices to user story objects
-            user_stories = []
-            for i in range(I.shape[1]):
-                idx = I[0, i]
-                if idx >= 0 and idx < len(vector_db_client["user_stories"]):
-                    # Get the story ID at this index
-                    story_id = list(vector_db_client["user_stories"].keys())[idx]
-                    story_data = vector_db_client["user_stories"][story_id]
-                    user_stories.append(UserStoryRecord(**story_data))
+            # Stories are stored in insertion order, which matches the index rows
+            stored_stories = list(vector_db_client["user_stories"].values())
+            user_stories = [
+                UserStoryRecord(**stored_stories[idx])
+                for idx in I[0]
+                if 0 <= idx < len(stored_stories)
+            ]
                 
             logger.info(f"Found {len(user_stories)} similar user stories in FAISS")
             return user_stories
@@ -459,14 +1198,14 @@ async def search_similar_user_stories(
 
 # Search for similar test cases
 async def search_similar_test_cases(
-    embedding: List[float], 
+    embedding: Union[List[float], np.ndarray], 
     limit: int = 5
 ) -> List[TestCaseRecord]:
     """
     Search for similar test cases in the vector database.
     
     Args:
-        embedding: The query embedding
+        embedding: The query embedding, as a list or float32 array
         limit: Maximum number of results to return
         
     Returns:
@@ -476,81 +1215,77 @@ async def search_similar_test_cases(
         logger.error("Vector DB client not initialized")
         return []
         
-    if not embedding:
+    if embedding is None or len(embedding) == 0:
         logger.error("Query embedding is missing")
         return []
+    
+    # Keep the query as a float32 array and only convert at the wire boundary
+    query_vector = np.asarray(embedding, dtype=np.float32)
         
     try:
         # Ensure schema exists
         await ensure_schema_exists()
         
-        if vector_db_config["type"].lower() == "weaviate":
-            import weaviate.classes as wvc
-            
+        if vector_db_config["type"] == "weaviate":
             # Search for similar test cases
             query = (
                 vector_db_client.query
-                .get("TestCase", ["story_id", "test_case_id", "title", "description", "test_case_text", "test_case_csv", "steps", "generated_at"])
+                .get("TestCase", list(_TEST_CASE_FIELDS))
                 .with_near_vector({
-                    "vector": embedding,
+                    "vector": query_vector.tolist(),
                 })
                 .with_limit(limit)
             )
             
             # Execute the query
-            result = query.do()
+            result = await _run_blocking(query.do)
             
             # Convert to TestCaseRecord objects
             test_cases = []
             for item in result.get("data", {}).get("Get", {}).get("TestCase", []):
                 # Convert steps from JSON strings back to dictionaries
                 if "steps" in item and item["steps"]:
-                    item["steps"] = [json.loads(step) for step in item["steps"]]
+                    item["steps"] = list(_parse_steps(tuple(item["steps"])))
                     
                 test_cases.append(TestCaseRecord(**item))
                 
             logger.info(f"Found {len(test_cases)} similar test cases in Weaviate")
             return test_cases
             
-        elif vector_db_config["type"].lower() == "qdrant":
-            from qdrant_client.http import models
-            
+        elif vector_db_config["type"] == "qdrant":
             # Search for similar test cases
-            search_result = vector_db_client.search(
+            search_result = await _run_blocking(
+                vector_db_client.search,
                 collection_name="test_cases",
-                query_vector=embedding,
-                limit=limit
+                query_vector=query_vector,
+                limit=limit,
+                with_payload=list(_TEST_CASE_FIELDS),
+                search_params=_qdrant_search_params()
             )
             
             # Convert to TestCaseRecord objects
-            test_cases = []
-            for item in search_result:
-                test_case_data = item.payload
-                test_case_data["embedding"] = None  # Embedding is not returned by Qdrant
-                test_cases.append(TestCaseRecord(**test_case_data))
+            # Embedding is not returned by Qdrant, so it is left at its default of None
+            test_cases = [
+                TestCaseRecord(**dict(zip(_TEST_CASE_FIELDS, _get_test_case_fields(item.payload))))
+                for item in search_result
+            ]
                 
             logger.info(f"Found {len(test_cases)} similar test cases in Qdrant")
             return test_cases
             
-        elif vector_db_config["type"].lower() == "faiss":
-            import numpy as np
-            
-            # Convert query to numpy array
-            query_vector = np.array([embedding], dtype=np.float32)
-            
+        elif vector_db_config["type"] == "faiss":
             # Search the index
             index = vector_db_client["index"]["test_cases"]
-            D, I = index.search(query_vector, limit)
+            D, I = index.search(_normalize_rows(query_vector.reshape(1, -1)), limit)
             
             # Convert indices to test case objects
-            test_cases = []
-            for i in range(I.shape[1]):
-                idx = I[0, i]
-                if idx >= 0 and idx < len(vector_db_client["test_cases"]):
-                    # Get the test case ID at this index
-                    test_case_id = list(vector_db_client["test_cases"].keys())[idx]
-                    test_case_data = vector_db_client["test_cases"][test_case_id]
-                    test_cases.append(TestCaseRecord(**test_case_data))
+            # Test cases are stored in insertion order, which matches the index rows
+            stored_test_cases = list(vector_db_client["test_cases"].values())
+            test_cases = [
+                TestCaseRecord(**stored_test_cases[idx])
+                for idx in I[0]
+                if 0 <= idx < len(stored_test_cases)
+            ]
                 
             logger.info(f"Found {len(test_cases)} similar test cases in FAISS")
             return test_cases
@@ -559,3 +1294,159 @@ async def search_similar_test_cases(
     except Exception as e:
         logger.error(f"Error searching for similar test cases: {e}", exc_info=True)
         return []
+
+# Search for similar user stories for several queries at once
+async def search_similar_user_stories_batch(
+    embeddings: Union[List[List[float]], np.ndarray],
+    limit: int = 3
+) -> List[List[UserStoryRecord]]:
+    """
+    Search for similar user stories for multiple query embeddings.
+    
+    Qdrant and FAISS answer all queries in a single request; Weaviate runs
+    the individual searches concurrently.
+    
+    Args:
+        embeddings: The query embeddings, as lists or rows of a float32 array
+        limit: Maximum number of results to return per query
+        
+    Returns:
+        List[List[UserStoryRecord]]: Similar user stories for each query, in query order
+    """
+    if len(embeddings) == 0:
+        return []
+        
+    if vector_db_client is None:
+        logger.error("Vector DB client not initialized")
+        return [[] for _ in embeddings]
+        
+    query_vectors = np.asarray(embeddings, dtype=np.float32)
+    
+    try:
+        await ensure_schema_exists()
+        
+        if vector_db_config["type"] == "qdrant":
+            from qdrant_client.http import models
+            
+            search_params = _qdrant_search_params()
+            batch_results = await _run_blocking(
+                vector_db_client.query_batch_points,
+                collection_name="user_stories",
+                requests=[
+                    models.QueryRequest(
+                        query=query_vector.tolist(),
+                        limit=limit,
+                        with_payload=list(_USER_STORY_FIELDS),
+                        params=search_params
+                    )
+                    for query_vector in query_vectors
+                ]
+            )
+            return [
+                [
+                    UserStoryRecord(**dict(zip(_USER_STORY_FIELDS, _get_user_story_fields(item.payload))))
+                    for item in search_result
+                ]
+                for search_result in (response.points for response in batch_results)
+            ]
+            
+        elif vector_db_config["type"] == "faiss":
+            index = vector_db_client["index"]["user_stories"]
+            D, I = index.search(_normalize_rows(query_vectors), limit)
+            
+            stored_stories = list(vector_db_client["user_stories"].values())
+            return [
+                [
+                    UserStoryRecord(**stored_stories[idx])
+                    for idx in row
+                    if 0 <= idx < len(stored_stories)
+                ]
+                for row in I
+            ]
+            
+        # Weaviate has no multi-vector query, so overlap the single searches
+        return list(await asyncio.gather(*[
+            search_similar_user_stories(query_vector, limit=limit)
+            for query_vector in query_vectors
+        ]))
+    except Exception as e:
+        logger.error(f"Error batch searching for similar user stories: {e}", exc_info=True)
+        return [[] for _ in embeddings]
+
+# Search for similar test cases for several queries at once
+async def search_similar_test_cases_batch(
+    embeddings: Union[List[List[float]], np.ndarray],
+    limit: int = 5
+) -> List[List[TestCaseRecord]]:
+    """
+    Search for similar test cases for multiple query embeddings.
+    
+    Qdrant and FAISS answer all queries in a single request; Weaviate runs
+    the individual searches concurrently.
+    
+    Args:
+        embeddings: The query embeddings, as lists or rows of a float32 array
+        limit: Maximum number of results to return per query
+        
+    Returns:
+        List[List[TestCaseRecord]]: Similar test cases for each query, in query order
+    """
+    if len(embeddings) == 0:
+        return []
+        
+    if vector_db_client is None:
+        logger.error("Vector DB client not initialized")
+        return [[] for _ in embeddings]
+        
+    query_vectors = np.asarray(embeddings, dtype=np.float32)
+    
+    try:
+        await ensure_schema_exists()
+        
+        if vector_db_config["type"] == "qdrant":
+            from qdrant_client.http import models
+            
+            search_params = _qdrant_search_params()
+            batch_results = await _run_blocking(
+                vector_db_client.query_batch_points,
+                collection_name="test_cases",
+                requests=[
+                    models.QueryRequest(
+                        query=query_vector.tolist(),
+                        limit=limit,
+                        with_payload=list(_TEST_CASE_FIELDS),
+                        params=search_params
+                    )
+                    for query_vector in query_vectors
+                ]
+            )
+            return [
+                [
+                    TestCaseRecord(**dict(zip(_TEST_CASE_FIELDS, _get_test_case_fields(item.payload))))
+                    for item in search_result
+                ]
+                for search_result in (response.points for response in batch_results)
+            ]
+            
+        elif vector_db_config["type"] == "faiss":
+            index = vector_db_client["index"]["test_cases"]
+            D, I = index.search(_normalize_rows(query_vectors), limit)
+            
+            stored_test_cases = list(vector_db_client["test_cases"].values())
+            return [
+                [
+                    TestCaseRecord(**stored_test_cases[idx])
+                    for idx in row
+                    if 0 <= idx < len(stored_test_cases)
+                ]
+                for row in I
+            ]
+            
+        # Weaviate has no multi-vector query, so overlap the single searches
+        return list(await asyncio.gather(*[
+            search_similar_test_cases(query_vector, limit=limit)
+            for query_vector in query_vectors
+        ]))
+    except Exception as e:
+        logger.error(f"Error batch searching for similar test cases: {e}", exc_info=True)
+        return [[] for _ in embeddings]
@@ -5,49 +5,40 @@ Shows how to store and retrieve user stories and test cases from the vector data
 import sys
 import os
 import asyncio
+import textwrap
 from pathlib import Path
 import datetime
+from typing import List
 
 # Add the parent directory to the path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 # Import the application components
 from app.services.vector_store import (
-    store_user_story,
+    store_user_stories,
     store_test_cases,
     search_similar_user_stories,
     search_similar_test_cases,
     ensure_schema_exists
 )
-from app.services.embedding import get_embedding
+from app.services.embedding import batch_get_embeddings, format_user_story_text, format_test_case_text
 from app.models.data_models import UserStoryRecord, TestCaseRecord
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-async def main():
-    """Main function for the demo"""
-    print("Vector Store Demo")
-    print("================")
-    
-    # Check if vector database is configured
-    if not os.environ.get("VECTOR_DB_URL"):
-        print("Error: VECTOR_DB_URL environment variable not set.")
-        print("Please set it in the .env file.")
-        return
+def make_sample_user_story(created_at: datetime.datetime) -> UserStoryRecord:
+    """
+    Build the sample user story used by the demo.
     
-    # Ensure the schema exists in the vector database
-    print("\nEnsuring schema exists in vector database...")
-    if not await ensure_schema_exists():
-        print("Error: Failed to ensure schema exists.")
-        return
-    
-    print("Schema verified successfully.")
-    
-    # Create a sample user story
-    print("\nCreating a sample user story...")
-    user_story = UserStoryRecord(
+    Args:
+        created_at: Timestamp for the story
+        
+    Returns:
+        UserStoryRecord: The sample user story
+    """
+    return UserStoryRecord(
         story_id="DEMO-001",
         project_id="DEMO-PROJECT",
         title="As a user, I want to reset my password",
@@ -61,26 +52,19 @@ async def main():
         4. User can create a new password that meets the security requirements
         5. User is notified when the password has been successfully reset
         """,
-        created_at=datetime.datetime.now()
+        created_at=created_at
     )
+
+def make_sample_test_cases(generated_at: datetime.datetime) -> List[TestCaseRecord]:
+    """
+    Build the sample test cases used by the demo.
     
-    # Generate embedding for the user story
-    print("Generating embedding for the user story...")
-    combined_text = f"{user_story.title}\n\n{user_story.description}"
-    user_story.embedding = await get_embedding(combined_text)
-    
-    # Store the user story in the vector database
-    print("Storing user story in vector database...")
-    if not await store_user_story(user_story):
-        print("Error: Failed to store user story.")
-        return
-    
-    print("User story stored successfully.")
-    
-    # Create sample test cases
-    print("\nCreating sample test cases...")
-    test_cases = []
-    
+    Args:
+        generated_at: Timestamp for the test cases
+        
+    Returns:
+        List[TestCaseRecord]: The sample test cases
+    """
     # Test case 1: Successful password reset
     test_case1 = TestCaseRecord(
         story_id="DEMO-001",
@@ -119,9 +103,8 @@ async def main():
             "8. Click 'Reset Password' button\n"
             "   - Expected: Success message is displayed and user is redirected to login page"
         ),
-        generated_at=datetime.datetime.now()
+        generated_at=generated_at
     )
-    test_cases.append(test_case1)
     
     # Test case 2: Invalid email
     test_case2 = TestCaseRecord(
@@ -149,51 +132,94 @@ async def main():
             "4. Click 'Send Reset Link' button\n"
             "   - Expected: Error message is displayed indicating email not found"
         ),
-        generated_at=datetime.datetime.now()
+        generated_at=generated_at
     )
-    test_cases.append(test_case2)
     
-    # Generate embeddings for the test cases
-    print("Generating embeddings for test cases...")
-    for test_case in test_cases:
-        combined_text = f"{test_case.title}\n\n{test_case.description}\n\n{test_case.test_case_text}"
-        test_case.embedding = await get_embedding(combined_text)
+    return [test_case1, test_case2]
+
+async def main():
+    """Main function for the demo"""
+    print("Vector Store Demo")
+    print("================")
     
-    # Store the test cases in the vector database
-    print("Storing test cases in vector database...")
-    if not await store_test_cases(test_cases):
-        print("Error: Failed to store test cases.")
+    # Check if vector database is configured
+    if not os.environ.get("VECTOR_DB_URL"):
+        print("Error: VECTOR_DB_URL environment variable not set.")
+        print("Please set it in the .env file.")
+        return
+    
+    # Ensure the schema exists in the vector database
+    print("\nEnsuring schema exists in vector database...")
+    if not await ensure_schema_exists():
+        print("Error: Failed to ensure schema exists.")
         return
     
-    print("Test cases stored successfully.")
+    print("Schema verified successfully.")
     
-    # Search for similar user stories
-    print("\nSearching for similar user stories...")
-    query_text = "As a user, I want to change my password to improve security"
-    query_embedding = await get_embedding(query_text)
+    # Create the sample user story and test cases with a shared timestamp
+    print("\nCreating a sample user story and test cases...")
+    created_at = datetime.datetime.now()
+    user_story = make_sample_user_story(created_at)
+    test_cases = make_sample_test_cases(created_at)
+    
+    # Generate embeddings for the user story and the test cases
+    # All texts go to the model in one batch instead of one request per record
+    print("Generating embeddings for the user story and test cases...")
+    texts = [format_user_story_text(user_story)] + [format_test_case_text(test_case) for test_case in test_cases]
+    user_story.embedding, *test_case_embeddings = await batch_get_embeddings(texts)
+    for test_case, embedding in zip(test_cases, test_case_embeddings):
+        test_case.embedding = embedding
+    
+    # Store the user story and the test cases in the vector database
+    # The two writes go to different collections, so run them concurrently
+    # Records stored by an earlier run of the demo are not uploaded again
+    print("Storing user story and test cases in vector database...")
+    story_stored, test_cases_stored = await asyncio.gather(
+        store_user_stories([user_story], skip_unchanged=True),
+        store_test_cases(test_cases, skip_unchanged=True)
+    )
+    if not story_stored:
+        print("Error: Failed to store user story.")
+        return
+    if not test_cases_stored:
+        print("Error: Failed to store test cases.")
+        return
     
-    similar_stories = await search_similar_user_stories(query_embedding, limit=2)
+    print("User story and test cases stored successfully.")
     
-    print(f"Found {len(similar_stories)} similar user stories:")
-    for i, story in enumerate(similar_stories):
-        print(f"\nSimilar User Story {i+1}:")
-        print(f"ID: {story.story_id}")
-        print(f"Title: {story.title}")
-        print(f"Description: {story.description[:100]}...")
+    # Search for similar user stories and test cases
+    # Both queries are embedded in one request, and the two searches hit
+    # independent collections, so they run concurrently
+    print("\nSearching for similar user stories and test cases...")
+    story_query_text = "As a user, I want to change my password to improve security"
+    test_case_query_text = "Test password reset with invalid email"
+    story_query_embedding, test_case_query_embedding = await batch_get_embeddings(
+        [story_query_text, test_case_query_text]
+    )
     
-    # Search for similar test cases
-    print("\nSearching for similar test cases...")
-    query_text = "Test password reset with invalid email"
-    query_embedding = await get_embedding(query_text)
+    similar_stories, similar_test_cases = await asyncio.gather(
+        search_similar_user_stories(story_query_embedding, limit=2),
+        search_similar_test_cases(test_case_query_embedding, limit=2)
+    )
     
-    similar_test_cases = await search_similar_test_cases(query_embedding, limit=2)
+    # Format each result once and print each list with a single call
+    print(f"Found {len(similar_stories)} similar user stories:")
+    print("".join(
+        f"\nSimilar User Story {i+1}:\n"
+        f"ID: {story.story_id}\n"
+        f"Title: {story.title}\n"
+        f"Description: {textwrap.shorten(story.description, width=100, placeholder='...')}\n"
+        for i, story in enumerate(similar_stories)
+    ))
     
     print(f"Found {len(similar_test_cases)} similar test cases:")
-    for i, test_case in enumerate(similar_test_cases):
-        print(f"\nSimilar Test Case {i+1}:")
-        print(f"ID: {test_case.test_case_id}")
-        print(f"Title: {test_case.title}")
-        print(f"Description: {test_case.description}")
+    print("".join(
+        f"\nSimilar Test Case {i+1}:\n"
+        f"ID: {test_case.test_case_id}\n"
+        f"Title: {test_case.title}\n"
+        f"Description: {test_case.description}\n"
+        for i, test_case in enumerate(similar_test_cases)
+    ))
     
     print("\nDemo complete!")
 
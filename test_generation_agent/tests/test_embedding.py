@@ -6,12 +6,26 @@ import os
 from pathlib import Path
 import pytest
 import asyncio
+import threading
+import numpy as np
+from unittest.mock import patch, AsyncMock, MagicMock
 
 # Add the parent directory to sys.path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 # Import the embedding service
-from app.services.embedding import get_embedding, batch_get_embeddings
+from app.services.embedding import (
+    get_embedding,
+    batch_get_embeddings,
+    get_sentence_transformer,
+    embed_user_stories,
+    get_openai_batch_embeddings,
+    format_user_story_text,
+    warmup_embedding_cache,
+    embedding_model_fingerprint,
+    EmbeddingCache
+)
+from app.models.data_models import UserStoryRecord
 
 @pytest.mark.asyncio
 async def test_get_embedding():
@@ -92,6 +106,365 @@ async def test_batch_get_embeddings_with_empty_texts():
         assert all(isinstance(emb, list) for emb in embeddings)
         assert all(all(isinstance(x, float) for x in emb) for emb in embeddings)
 
+def test_format_user_story_text_normalizes_whitespace():
+    """Test that indentation and blank lines are collapsed before embedding"""
+    story = UserStoryRecord(
+        story_id="1",
+        project_id="TEST-PROJECT",
+        title="  As a user, I want to log in ",
+        description="""
+        As a registered user, I want to log in.
+        
+        Acceptance Criteria:
+        1. User can enter email and password
+        """
+    )
+    
+    assert format_user_story_text(story) == (
+        "As a user, I want to log in\n\n"
+        "As a registered user, I want to log in. Acceptance Criteria: 1. User can enter email and password"
+    )
+
+@pytest.mark.asyncio
+async def test_embed_user_stories_uses_one_batch():
+    """Test that embedding several user stories makes a single batch call"""
+    stories = [
+        UserStoryRecord(story_id=str(i), project_id="TEST-PROJECT", title=f"Story {i}", description="Description")
+        for i in range(5)
+    ]
+    embeddings = [[float(i)] for i in range(5)]
+    
+    with patch("app.services.embedding.batch_get_embeddings", AsyncMock(return_value=embeddings)) as mock_batch:
+        result = await embed_user_stories(stories)
+    
+    mock_batch.assert_awaited_once_with([f"Story {i}\n\nDescription" for i in range(5)])
+    assert [story.embedding for story in result] == embeddings
+
+@pytest.mark.asyncio
+async def test_openai_batch_embeddings_caps_concurrency():
+    """Test that batched OpenAI requests never exceed the concurrency cap"""
+    in_flight = 0
+    max_in_flight = 0
+    
+    async def fake_create(model, input):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return MagicMock(data=[MagicMock(embedding=[float(text)]) for text in input])
+    
+    mock_client = MagicMock()
+    mock_client.embeddings.create = AsyncMock(side_effect=fake_create)
+    texts = [str(i) for i in range(40)]
+    
+    with patch("app.services.embedding.client", mock_client), \
+         patch("app.services.embedding.EMBEDDING_BATCH_SIZE", 2), \
+         patch("app.services.embedding.MAX_CONCURRENT_EMBEDDING_BATCHES", 3):
+        embeddings = await get_openai_batch_embeddings(texts)
+    
+    assert mock_client.embeddings.create.await_count == 20
+    assert max_in_flight <= 3
+    assert embeddings == [[float(i)] for i in range(40)]
+
+def test_get_sentence_transformer_singleton():
+    """Test that the Sentence Transformers model is only loaded once per name"""
+    get_sentence_transformer.cache_clear()
+    try:
+        with patch("app.services.embedding.SentenceTransformer", create=True) as mock_model_class:
+            first = get_sentence_transformer("test-model")
+            second = get_sentence_transformer("test-model")
+            
+            assert first is second
+            mock_model_class.assert_called_once_with("test-model")
+    finally:
+        get_sentence_transformer.cache_clear()
+
+def test_cache_get_set():
+    """Test storing and retrieving embeddings from the cache"""
+    cache = EmbeddingCache(max_size=10)
+    
+    assert cache.get("story") is None
+    
+    cache.set("story", [0.5, 0.25, 0.125])
+    assert cache.get("story") == pytest.approx([0.5, 0.25, 0.125], abs=1e-2)
+
+def test_cache_namespaces_separate_models(tmp_path):
+    """Test that embeddings cached for one model are not returned for another"""
+    old_model = EmbeddingCache(max_size=4, cache_dir=str(tmp_path), namespace="openai/model-a|v1")
+    old_model.set("story text", [0.5, 0.25])
+    
+    new_model = EmbeddingCache(max_size=4, cache_dir=str(tmp_path), namespace="openai/model-b|v1")
+    assert new_model.get("story text") is None
+    
+    same_model = EmbeddingCache(max_size=4, cache_dir=str(tmp_path), namespace="openai/model-a|v1")
+    assert same_model.get("story text") == pytest.approx([0.5, 0.25], abs=1e-2)
+
+def test_embedding_model_fingerprint_tracks_model():
+    """Test that the cache fingerprint changes with the configured model"""
+    with patch("app.services.embedding.has_openai", True), \
+         patch("app.services.embedding.client", MagicMock()), \
+         patch("app.services.embedding.OPENAI_EMBEDDING_MODEL", "model-a"):
+        first = embedding_model_fingerprint()
+    with patch("app.services.embedding.has_openai", True), \
+         patch("app.services.embedding.client", MagicMock()), \
+         patch("app.services.embedding.OPENAI_EMBEDDING_MODEL", "model-b"):
+        second = embedding_model_fingerprint()
+    
+    assert first != second
+    assert "model-a" in first
+
+def test_cache_lru_behavior():
+    """Test that the least recently used entry is evicted when full"""
+    cache = EmbeddingCache(max_size=2, dtype=np.float32)
+    
+    cache.set("a", [1.0])
+    cache.set("b", [2.0])
+    
+    # Access "a" so that "b" becomes the least recently used entry
+    assert cache.get("a") == [1.0]
+    
+    cache.set("c", [3.0])
+    
+    assert cache.get("a") == [1.0]
+    assert cache.get("b") is None
+    assert cache.get("c") == [3.0]
+
+def test_cache_sampled_eviction_keeps_size_bounded():
+    """Test that sampled eviction never grows the cache past max_size"""
+    cache = EmbeddingCache(max_size=50, sample_size=8, dtype=np.float32)
+    
+    for i in range(500):
+        cache.set(f"text {i}", [float(i)])
+    
+    assert cache.get_stats()["size"] == 50
+    # The most recent insert always survives eviction
+    assert cache.get("text 499") == [499.0]
+
+def test_cache_stores_float32_matrix():
+    """Test that cached embeddings are packed into one float32 matrix"""
+    cache = EmbeddingCache(max_size=4, dtype=np.float32)
+    
+    cache.set("a", [1.0] * 1536)
+    cache.set("b", [2.0] * 1536)
+    
+    assert cache.matrix.shape == (4, 1536)
+    assert cache.matrix.dtype == np.float32
+    assert cache.get("b") == [2.0] * 1536
+
+def test_cache_quantizes_to_int8():
+    """Test that cached embeddings are quantized to int8 with a per-vector scale"""
+    cache = EmbeddingCache(max_size=4)
+    embedding = np.linspace(-0.5, 0.5, 1536).tolist()
+    
+    cache.set("story", embedding)
+    
+    assert cache.matrix.dtype == np.int8
+    quantized, scale = cache.get_int8("story")
+    assert np.abs(quantized).max() == 127
+    assert scale == pytest.approx(0.5 / 127)
+    assert cache.get("story") == pytest.approx(embedding, abs=scale)
+
+def test_cache_float16_storage():
+    """Test that the cache can store embeddings as float16"""
+    cache = EmbeddingCache(max_size=4, dtype=np.float16)
+    
+    cache.set("story", [0.5, 0.25, 0.125])
+    
+    assert cache.matrix.dtype == np.float16
+    assert cache.get("story") == [0.5, 0.25, 0.125]
+    assert cache.get_int8("story") is None
+
+def test_cache_disk_tier_survives_restart(tmp_path):
+    """Test that embeddings written to disk are reused by a new cache instance"""
+    embedding = [0.5, 0.25, 0.125]
+    
+    first = EmbeddingCache(max_size=4, cache_dir=str(tmp_path))
+    first.set("story", embedding)
+    
+    # Simulate a process restart with an empty in-memory cache
+    second = EmbeddingCache(max_size=4, cache_dir=str(tmp_path))
+    assert second.get_stats()["size"] == 0
+    assert second.get("story") == embedding
+    assert second.get_stats()["size"] == 1
+    assert second.get("missing") is None
+
+@pytest.mark.asyncio
+async def test_get_embedding_uses_disk_cache_after_restart(tmp_path):
+    """Test that repeated texts make no embedding calls after a restart"""
+    mock_embed = AsyncMock(return_value=[0.5, 0.25])
+    
+    with patch("app.services.embedding.has_openai", False), \
+         patch("app.services.embedding.get_sentence_transformer_embedding", mock_embed):
+        with patch("app.services.embedding.embedding_cache", EmbeddingCache(cache_dir=str(tmp_path))):
+            await get_embedding("A repeated user story")
+        
+        with patch("app.services.embedding.embedding_cache", EmbeddingCache(cache_dir=str(tmp_path))):
+            embedding = await get_embedding("A repeated user story")
+    
+    assert mock_embed.await_count == 1
+    assert embedding == [0.5, 0.25]
+
+@pytest.mark.asyncio
+async def test_zero_size_cache_disables_caching(tmp_path):
+    """Test that EMBEDDING_CACHE_SIZE=0 turns the cache off instead of failing every call"""
+    cache = EmbeddingCache(max_size=0, cache_dir=str(tmp_path))
+    mock_embed = AsyncMock(return_value=[0.5, 0.25])
+    
+    with patch("app.services.embedding.has_openai", False), \
+         patch("app.services.embedding.get_sentence_transformer_embedding", mock_embed), \
+         patch("app.services.embedding.embedding_cache", cache):
+        first = await get_embedding("A user story that is worth caching")
+        second = await get_embedding("A user story that is worth caching")
+    
+    assert first == second == [0.5, 0.25]
+    assert mock_embed.await_count == 2
+    assert cache.get_stats()["size"] == 0
+    assert cache.disk is None
+
+@pytest.mark.asyncio
+async def test_batch_get_embeddings_writes_disk_cache_in_one_commit(tmp_path):
+    """Test that a batch of new embeddings is written to disk in a single transaction"""
+    cache = EmbeddingCache(max_size=10, cache_dir=str(tmp_path))
+    # NORMAL (1) instead of FULL, so commits don't fsync
+    assert cache.disk.execute("PRAGMA synchronous").fetchone()[0] == 1
+    cache.disk = MagicMock(wraps=cache.disk)
+    mock_compute = AsyncMock(side_effect=lambda texts: ([[0.5, 0.25] for _ in texts], False))
+    texts = [f"A new user story number {i}" for i in range(3)]
+    
+    with patch("app.services.embedding.compute_batch_embeddings", mock_compute), \
+         patch("app.services.embedding.embedding_cache", cache):
+        await batch_get_embeddings(texts)
+    
+    cache.disk.executemany.assert_called_once()
+    assert len(cache.disk.executemany.call_args.args[1]) == len(texts)
+    cache.disk.commit.assert_called_once()
+    assert EmbeddingCache(max_size=10, cache_dir=str(tmp_path)).get(texts[2]) == [0.5, 0.25]
+
+@pytest.mark.asyncio
+async def test_batch_get_embeddings_reads_disk_cache_off_the_event_loop(tmp_path):
+    """Test that disk cache lookups run in a worker thread, without holding the memory lock"""
+    texts = [f"A stored user story number {i}" for i in range(3)]
+    EmbeddingCache(max_size=10, cache_dir=str(tmp_path)).set_many([(text, [0.5, 0.25]) for text in texts])
+    cache = EmbeddingCache(max_size=10, cache_dir=str(tmp_path))
+    main_thread = threading.get_ident()
+    reads = []
+    load_from_disk = cache._load_from_disk
+    
+    def tracked_load(keys):
+        # The memory tier stays usable by other callers while the disk is read
+        assert cache.lock.acquire(blocking=False)
+        cache.lock.release()
+        reads.append((threading.get_ident(), len(keys)))
+        return load_from_disk(keys)
+    
+    cache._load_from_disk = tracked_load
+    mock_compute = AsyncMock()
+    
+    with patch("app.services.embedding.compute_batch_embeddings", mock_compute), \
+         patch("app.services.embedding.embedding_cache", cache):
+        embeddings = await batch_get_embeddings(texts)
+    
+    assert embeddings == [[0.5, 0.25]] * len(texts)
+    mock_compute.assert_not_awaited()
+    assert len(reads) == 1
+    assert reads[0][0] != main_thread
+    assert reads[0][1] == len(texts)
+
+@pytest.mark.asyncio
+async def test_get_embedding_skips_cache_for_long_texts():
+    """Test that very long texts are neither looked up nor stored in the cache"""
+    cache = EmbeddingCache(max_size=4)
+    mock_embed = AsyncMock(return_value=[0.5, 0.25])
+    
+    with patch("app.services.embedding.has_openai", False), \
+         patch("app.services.embedding.get_sentence_transformer_embedding", mock_embed), \
+         patch("app.services.embedding.embedding_cache", cache):
+        await get_embedding("x" * 10000)
+        await get_embedding("A user story that is worth caching")
+    
+    stats = cache.get_stats()
+    assert stats["size"] == 1
+    assert stats["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_batch_get_embeddings_only_embeds_uncached_texts():
+    """Test that batch embedding reuses cached texts and embeds duplicates once"""
+    cache = EmbeddingCache(max_size=10, dtype=np.float32)
+    mock_compute = AsyncMock(side_effect=lambda texts: ([[float(len(text))] for text in texts], False))
+    
+    with patch("app.services.embedding.compute_batch_embeddings", mock_compute), \
+         patch("app.services.embedding.embedding_cache", cache):
+        await warmup_embedding_cache(["A frequently seen user story"])
+        embeddings = await batch_get_embeddings([
+            "A frequently seen user story",
+            "A brand new user story text",
+            "A brand new user story text"
+        ])
+    
+    assert mock_compute.await_count == 2
+    mock_compute.assert_awaited_with(["A brand new user story text"])
+    assert embeddings == [[28.0], [27.0], [27.0]]
+
+def test_cache_stats():
+    """Test the cache hit/miss statistics"""
+    cache = EmbeddingCache(max_size=10)
+    
+    cache.set("story", [1.0])
+    cache.get("story")
+    cache.get("missing")
+    
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_cache_stats_are_thread_safe():
+    """Test that concurrent lookups from several threads are all counted"""
+    cache = EmbeddingCache(max_size=10)
+    cache.set("story", [1.0])
+    
+    def lookup():
+        for _ in range(1000):
+            cache.get("story")
+            cache.get("missing")
+    
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    stats = cache.get_stats()
+    assert stats["hits"] == 8000
+    assert stats["misses"] == 8000
+    assert stats["hit_rate"] == 0.5
+
+@pytest.mark.asyncio
+async def test_fallback_embeddings_are_not_cached(tmp_path):
+    """Test that Sentence Transformers fallback vectors are not cached under the OpenAI model"""
+    cache = EmbeddingCache(max_size=4, cache_dir=str(tmp_path))
+    mock_client = MagicMock()
+    mock_client.embeddings.create = AsyncMock(side_effect=RuntimeError("429 Too Many Requests"))
+    mock_fallback = AsyncMock(return_value=[0.5] * 384)
+    mock_encode = MagicMock(return_value=np.full((1, 384), 0.5))
+    
+    with patch("app.services.embedding.has_openai", True), \
+         patch("app.services.embedding.client", mock_client), \
+         patch("app.services.embedding.get_sentence_transformer_embedding", mock_fallback), \
+         patch("app.services.embedding.get_sentence_transformer", return_value=MagicMock(encode=mock_encode)), \
+         patch("app.services.embedding.embedding_cache", cache):
+        single = await get_embedding("A user story embedded during an outage")
+        batch = await batch_get_embeddings(["Another story embedded during an outage"])
+    
+    assert len(single) == 384
+    assert len(batch[0]) == 384
+    assert cache.get_stats()["size"] == 0
+    # Nothing was written through to disk either, so a restart calls OpenAI again
+    restarted = EmbeddingCache(max_size=4, cache_dir=str(tmp_path))
+    assert restarted.get("A user story embedded during an outage") is None
+    assert restarted.get("Another story embedded during an outage") is None
+
 if __name__ == "__main__":
     # Run the tests manually
     asyncio.run(test_get_embedding())
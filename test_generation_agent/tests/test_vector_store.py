@@ -7,6 +7,11 @@ from pathlib import Path
 import pytest
 import asyncio
 import datetime
+import uuid
+import threading
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock, ANY
 
 # Add the parent directory to sys.path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -15,12 +20,42 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from app.services.vector_store import (
     ensure_schema_exists,
     store_user_story,
+    store_user_stories,
+    bulk_load,
     store_test_cases,
     search_similar_user_stories,
-    search_similar_test_cases
+    search_similar_test_cases,
+    search_similar_user_stories_batch,
+    search_similar_test_cases_batch
 )
+from app.services import vector_store
 from app.models.data_models import UserStoryRecord, TestCaseRecord
 
+# Fixed timestamp so sample records are identical across tests and runs
+FROZEN_TIME = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+def make_hits(n, payload):
+    """Build n lightweight Qdrant-style search hits sharing the given payload"""
+    return [SimpleNamespace(payload=dict(payload), score=1.0 - i / n) for i in range(n)]
+
+@pytest.fixture
+def qdrant_client():
+    """Patch in a mock Qdrant client as the configured vector database"""
+    client = MagicMock()
+    with patch("app.services.vector_store.vector_db_client", client), \
+         patch("app.services.vector_store.vector_db_config", {"type": "qdrant"}):
+        yield client
+
+@pytest.fixture
+def weaviate_client():
+    """Patch in a mock Weaviate client as the configured vector database"""
+    client = MagicMock()
+    # Batch.configure returns the batch itself, like the real client
+    client.batch.configure.return_value = client.batch
+    with patch("app.services.vector_store.vector_db_client", client), \
+         patch("app.services.vector_store.vector_db_config", {"type": "weaviate"}):
+        yield client
+
 @pytest.fixture
 def sample_user_story():
     """Create a sample user story for testing"""
@@ -38,7 +73,7 @@ def sample_user_story():
         4. User can see how many results were found
         5. User receives a message when no results are found
         """,
-        created_at=datetime.datetime.now(),
+        created_at=FROZEN_TIME,
         embedding=[0.1] * 1536  # Mock embedding
     )
 
@@ -57,7 +92,7 @@ def sample_test_cases():
             {"action": "Verify search results", "expected": "Search results show matching products with images and prices"}
         ],
         test_case_text="Sample test case text",
-        generated_at=datetime.datetime.now(),
+        generated_at=FROZEN_TIME,
         embedding=[0.2] * 1536  # Mock embedding
     )
     
@@ -73,7 +108,7 @@ def sample_test_cases():
             {"action": "Verify no results message", "expected": "Message indicating no results were found is displayed"}
         ],
         test_case_text="Sample test case text",
-        generated_at=datetime.datetime.now(),
+        generated_at=FROZEN_TIME,
         embedding=[0.3] * 1536  # Mock embedding
     )
     
@@ -89,6 +124,64 @@ async def test_ensure_schema_exists():
     # Check the result
     assert result is True
 
+@pytest.mark.asyncio
+async def test_ensure_schema_exists_enables_scalar_quantization(qdrant_client):
+    """Test that new Qdrant collections are created with int8 scalar quantization"""
+    pytest.importorskip("qdrant_client")
+    from qdrant_client.http import models
+    qdrant_client.get_collections.return_value.collections = []
+    
+    result = await ensure_schema_exists()
+    
+    assert result is True
+    assert qdrant_client.create_collection.call_count == 2
+    for call in qdrant_client.create_collection.call_args_list:
+        quantization_config = call.kwargs["quantization_config"]
+        assert quantization_config.scalar.type == models.ScalarType.INT8
+        assert quantization_config.scalar.always_ram is True
+
+@pytest.mark.asyncio
+async def test_ensure_schema_exists_tunes_hnsw(qdrant_client):
+    """Test that new Qdrant collections are created with tuned HNSW parameters"""
+    pytest.importorskip("qdrant_client")
+    qdrant_client.get_collections.return_value.collections = []
+    
+    await ensure_schema_exists()
+    
+    for call in qdrant_client.create_collection.call_args_list:
+        hnsw_config = call.kwargs["hnsw_config"]
+        assert hnsw_config.m == vector_store.HNSW_M
+        assert hnsw_config.ef_construct == vector_store.HNSW_EF_CONSTRUCT
+
+@pytest.mark.asyncio
+async def test_ensure_schema_exists_caches_successful_check(weaviate_client):
+    """Test that the schema is only fetched once within the check TTL"""
+    weaviate_client.schema.get.return_value = {"classes": [{"class": "UserStory"}, {"class": "TestCase"}]}
+    
+    results = [await ensure_schema_exists() for _ in range(10)]
+    assert weaviate_client.schema.get.call_count == 1
+    
+    # Once the TTL has passed the schema is checked again
+    with patch("app.services.vector_store.SCHEMA_CHECK_TTL", 0.0):
+        await ensure_schema_exists()
+    assert weaviate_client.schema.get.call_count == 2
+    
+    assert all(results)
+
+@pytest.mark.asyncio
+async def test_ensure_schema_exists_configures_weaviate_hnsw(weaviate_client):
+    """Test that new Weaviate classes are created with explicit HNSW settings"""
+    weaviate_client.schema.get.return_value = {"classes": []}
+    
+    await ensure_schema_exists()
+    
+    assert weaviate_client.schema.create_class.call_count == 2
+    for call in weaviate_client.schema.create_class.call_args_list:
+        class_obj = call.args[0]
+        assert class_obj["vectorIndexType"] == "hnsw"
+        assert class_obj["vectorIndexConfig"]["maxConnections"] == vector_store.HNSW_M
+        assert class_obj["vectorIndexConfig"]["ef"] == vector_store.HNSW_EF_SEARCH
+
 @pytest.mark.asyncio
 @pytest.mark.skipif(not os.environ.get("VECTOR_DB_URL"), reason="Vector DB URL not set")
 async def test_store_user_story(sample_user_story):
@@ -162,14 +255,567 @@ async def test_full_vector_store_workflow(sample_user_story, sample_test_cases):
     store_cases_result = await store_test_cases(sample_test_cases)
     assert store_cases_result is True
     
-    # Search for similar user stories
-    similar_stories = await search_similar_user_stories(sample_user_story.embedding, limit=1)
+    # Search for similar user stories and test cases concurrently
+    similar_stories, similar_test_cases = await asyncio.gather(
+        search_similar_user_stories(sample_user_story.embedding, limit=1),
+        search_similar_test_cases(sample_test_cases[0].embedding, limit=1)
+    )
     assert isinstance(similar_stories, list)
-    
-    # Search for similar test cases
-    similar_test_cases = await search_similar_test_cases(sample_test_cases[0].embedding, limit=1)
     assert isinstance(similar_test_cases, list)
 
+@pytest.mark.asyncio
+async def test_store_test_cases_weaviate_uses_single_batch(sample_test_cases, weaviate_client):
+    """Test that Weaviate test cases are sent in one batch instead of one request each"""
+    mock_batch = weaviate_client.batch.__enter__.return_value
+    
+    result = await store_test_cases(sample_test_cases)
+    
+    assert result is True
+    assert mock_batch.add_data_object.call_count == len(sample_test_cases)
+    assert weaviate_client.batch.__exit__.call_count == 1
+    weaviate_client.data_object.create.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_store_test_cases_weaviate_reports_rejected_objects(sample_test_cases, weaviate_client):
+    """Test that objects rejected inside a Weaviate batch make the store fail"""
+    rejected = {"error": [{"message": "invalid text property 'steps'"}]}
+    
+    def flush_with_errors(*exc_info):
+        callback = weaviate_client.batch.configure.call_args.kwargs["callback"]
+        callback([{"result": {}}, {"result": {"errors": rejected}}])
+        return False
+    
+    weaviate_client.batch.__exit__.side_effect = flush_with_errors
+    
+    with patch("app.services.vector_store.logger") as mock_logger:
+        result = await store_test_cases(sample_test_cases)
+    
+    assert result is False
+    assert "invalid text property 'steps'" in mock_logger.error.call_args.args[0]
+
+@pytest.mark.asyncio
+async def test_store_user_story_weaviate_reports_rejected_object(sample_user_story, weaviate_client):
+    """Test that a single story rejected by Weaviate makes the store fail"""
+    def flush_with_errors(*exc_info):
+        callback = weaviate_client.batch.configure.call_args.kwargs["callback"]
+        callback([{"result": {"errors": {"error": [{"message": "vector lengths don't match"}]}}}])
+        return False
+    
+    weaviate_client.batch.__exit__.side_effect = flush_with_errors
+    
+    with patch("app.services.vector_store.logger") as mock_logger:
+        result = await store_user_story(sample_user_story)
+    
+    assert result is False
+    assert "vector lengths don't match" in mock_logger.error.call_args.args[0]
+
+@pytest.mark.asyncio
+async def test_store_user_stories_weaviate_uses_single_batch(sample_user_story, weaviate_client):
+    """Test that Weaviate user stories are sent in one batch instead of one request each"""
+    stories = [sample_user_story.copy(update={"story_id": f"TEST-VS-{i:03d}"}) for i in range(5)]
+    mock_batch = weaviate_client.batch.__enter__.return_value
+    
+    result = await store_user_stories(stories)
+    
+    assert result is True
+    assert mock_batch.add_data_object.call_count == len(stories)
+    assert [call.kwargs["uuid"] for call in mock_batch.add_data_object.call_args_list] == [
+        vector_store._weaviate_object_id(story.story_id) for story in stories
+    ]
+    assert weaviate_client.batch.__exit__.call_count == 1
+    weaviate_client.data_object.create.assert_not_called()
+    weaviate_client.batch.configure.assert_called_once_with(
+        batch_size=vector_store.WEAVIATE_BATCH_SIZE,
+        dynamic=True,
+        num_workers=vector_store.WEAVIATE_BATCH_WORKERS,
+        callback=ANY
+    )
+
+@pytest.mark.asyncio
+async def test_gathered_weaviate_stores_take_turns_with_the_batch(sample_user_story, sample_test_cases, weaviate_client):
+    """Test that concurrent Weaviate stores never have the shared batch open at the same time"""
+    open_batches = []
+    max_open = []
+    
+    def enter_batch():
+        open_batches.append(1)
+        max_open.append(len(open_batches))
+        threading.Event().wait(0.05)
+        return weaviate_client.batch
+    
+    def exit_batch(*exc_info):
+        open_batches.pop()
+        return False
+    
+    weaviate_client.batch.__enter__.side_effect = enter_batch
+    weaviate_client.batch.__exit__.side_effect = exit_batch
+    
+    results = await asyncio.gather(
+        store_user_stories([sample_user_story]),
+        store_test_cases(sample_test_cases)
+    )
+    
+    assert results == [True, True]
+    assert max(max_open) == 1
+    assert weaviate_client.batch.add_data_object.call_count == 1 + len(sample_test_cases)
+
+@pytest.mark.asyncio
+async def test_store_user_stories_qdrant_uploads_in_batches(sample_user_story, qdrant_client):
+    """Test that Qdrant user stories are uploaded with one batched upload call"""
+    pytest.importorskip("qdrant_client")
+    stories = [sample_user_story.copy(update={"story_id": f"TEST-VS-{i:03d}"}) for i in range(5)]
+    
+    result = await store_user_stories(stories)
+    
+    assert result is True
+    qdrant_client.upload_points.assert_called_once()
+    upload_kwargs = qdrant_client.upload_points.call_args.kwargs
+    assert upload_kwargs["collection_name"] == "user_stories"
+    assert len(upload_kwargs["points"]) == len(stories)
+    assert upload_kwargs["points"][0].id == vector_store._qdrant_point_id(stories[0].story_id)
+    # A search right after the store must see the new points
+    assert upload_kwargs["wait"] is True
+    qdrant_client.upsert.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_bulk_load_qdrant_defers_indexing(sample_user_story, sample_test_cases, qdrant_client):
+    """Test that Qdrant indexing is disabled during a bulk load and restored afterwards"""
+    pytest.importorskip("qdrant_client")
+    from qdrant_client.http import models
+    stories = [sample_user_story.copy(update={"story_id": f"TEST-VS-{i:03d}"}) for i in range(5)]
+    qdrant_client.get_collection.return_value.status = models.CollectionStatus.GREEN
+    qdrant_client.count.return_value.count = 0
+    
+    result = await bulk_load(stories, sample_test_cases)
+    
+    assert result is True
+    assert qdrant_client.upload_points.call_count == 2
+    update_calls = qdrant_client.update_collection.call_args_list
+    assert [call.kwargs["hnsw_config"].m for call in update_calls] == [0, 0, 32, 32]
+    assert [call.kwargs["optimizer_config"].indexing_threshold for call in update_calls] == [
+        0, 0, vector_store.QDRANT_INDEXING_THRESHOLD, vector_store.QDRANT_INDEXING_THRESHOLD
+    ]
+    assert qdrant_client.get_collection.call_count == 2
+
+@pytest.mark.asyncio
+async def test_gathered_qdrant_stores_run_concurrently(sample_user_story, sample_test_cases, qdrant_client):
+    """Test that gathered stores don't block the event loop while uploading"""
+    pytest.importorskip("qdrant_client")
+    # Each upload only returns once the other one has also reached the client
+    barrier = threading.Barrier(2, timeout=5)
+    qdrant_client.upload_points.side_effect = lambda **kwargs: barrier.wait()
+    
+    results = await asyncio.gather(
+        store_user_stories([sample_user_story]),
+        store_test_cases(sample_test_cases)
+    )
+    
+    assert results == [True, True]
+    assert qdrant_client.upload_points.call_count == 2
+    # The concurrent schema checks list the collections only once
+    qdrant_client.get_collections.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_store_user_stories_qdrant_skips_unchanged(sample_user_story, qdrant_client):
+    """Test that stories already stored with the same content are not uploaded again"""
+    pytest.importorskip("qdrant_client")
+    changed = sample_user_story.copy(update={"story_id": "TEST-VS-002"})
+    qdrant_client.retrieve.return_value = [
+        SimpleNamespace(
+            id=vector_store._qdrant_point_id(sample_user_story.story_id),
+            # Stored a day earlier; the timestamp is not part of the content
+            payload={"content_fp": vector_store._record_fingerprint(
+                sample_user_story.copy(update={"created_at": FROZEN_TIME + datetime.timedelta(days=1)})
+            )}
+        )
+    ]
+    
+    result = await store_user_stories([sample_user_story, changed], skip_unchanged=True)
+    
+    assert result is True
+    qdrant_client.upload_points.assert_called_once()
+    points = qdrant_client.upload_points.call_args.kwargs["points"]
+    # The unchanged story is still skipped, only the changed one is uploaded
+    assert [point.id for point in points] == [vector_store._qdrant_point_id(changed.story_id)]
+    assert points[0].payload["content_fp"] == vector_store._record_fingerprint(changed)
+
+@pytest.mark.asyncio
+async def test_store_user_stories_qdrant_no_lookup_by_default(sample_user_story, qdrant_client):
+    """Test that a plain store makes no extra round trip to look up stored records"""
+    pytest.importorskip("qdrant_client")
+    
+    result = await store_user_stories([sample_user_story])
+    
+    assert result is True
+    qdrant_client.retrieve.assert_not_called()
+    qdrant_client.upload_points.assert_called_once()
+
+def test_record_fingerprint_changes_with_embedding_model(sample_user_story):
+    """Test that switching the embedding model invalidates stored fingerprints"""
+    with patch("app.services.vector_store.embedding_model_fingerprint", return_value="openai/a|v1"):
+        before = vector_store._record_fingerprint(sample_user_story)
+    with patch("app.services.vector_store.embedding_model_fingerprint", return_value="openai/b|v1"):
+        after = vector_store._record_fingerprint(sample_user_story)
+    
+    assert before != after
+
+@pytest.mark.asyncio
+async def test_bulk_load_qdrant_keeps_graph_of_populated_collections(sample_user_story, qdrant_client):
+    """Test that a bulk load into a populated collection only pauses indexing"""
+    pytest.importorskip("qdrant_client")
+    from qdrant_client.http import models
+    qdrant_client.get_collection.return_value.status = models.CollectionStatus.GREEN
+    qdrant_client.count.return_value.count = 1000
+    
+    result = await bulk_load([sample_user_story], [])
+    
+    assert result is True
+    update_calls = qdrant_client.update_collection.call_args_list
+    assert [call.kwargs["collection_name"] for call in update_calls] == ["user_stories", "user_stories"]
+    assert all(call.kwargs["hnsw_config"] is None for call in update_calls)
+    assert [call.kwargs["optimizer_config"].indexing_threshold for call in update_calls] == [
+        0, vector_store.QDRANT_INDEXING_THRESHOLD
+    ]
+
+@pytest.mark.asyncio
+async def test_bulk_load_qdrant_skips_indexing_toggle_when_nothing_changed(sample_user_story, qdrant_client):
+    """Test that re-running a bulk load with unchanged records leaves the collections alone"""
+    pytest.importorskip("qdrant_client")
+    qdrant_client.retrieve.return_value = [
+        SimpleNamespace(
+            id=vector_store._qdrant_point_id(sample_user_story.story_id),
+            payload={"content_fp": vector_store._record_fingerprint(sample_user_story)}
+        )
+    ]
+    
+    result = await bulk_load([sample_user_story], [])
+    
+    assert result is True
+    qdrant_client.upload_points.assert_not_called()
+    qdrant_client.update_collection.assert_not_called()
+    qdrant_client.get_collection.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_bulk_load_qdrant_fails_when_indexing_times_out(sample_user_story, qdrant_client):
+    """Test that a bulk load reports failure if indexing does not finish in time"""
+    pytest.importorskip("qdrant_client")
+    from qdrant_client.http import models
+    qdrant_client.get_collection.return_value.status = models.CollectionStatus.YELLOW
+    
+    with patch("app.services.vector_store.QDRANT_INDEXING_TIMEOUT", 0.01), \
+         patch("app.services.vector_store.QDRANT_INDEXING_POLL_INTERVAL", 0.005):
+        result = await bulk_load([sample_user_story], [])
+    
+    assert result is False
+    qdrant_client.upload_points.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_bulk_load_qdrant_pipelines_embedding_and_upload(sample_user_story, sample_test_cases, qdrant_client):
+    """Test that a Qdrant bulk load embeds and uploads records chunk by chunk"""
+    pytest.importorskip("qdrant_client")
+    from qdrant_client.http import models
+    stories = [
+        sample_user_story.copy(update={"story_id": f"TEST-VS-{i:03d}", "embedding": None})
+        for i in range(5)
+    ]
+    qdrant_client.get_collection.return_value.status = models.CollectionStatus.GREEN
+    
+    async def fake_embed(records):
+        for record in records:
+            record.embedding = [0.1] * 1536
+        return records
+    mock_embed = AsyncMock(side_effect=fake_embed)
+    
+    with patch("app.services.vector_store.embed_user_stories", mock_embed), \
+         patch("app.services.vector_store.BULK_LOAD_CHUNK_SIZE", 2):
+        result = await bulk_load(stories, sample_test_cases)
+    
+    assert result is True
+    assert [len(call.args[0]) for call in mock_embed.call_args_list] == [2, 2, 1]
+    story_uploads = [
+        call.kwargs["points"] for call in qdrant_client.upload_points.call_args_list
+        if call.kwargs["collection_name"] == "user_stories"
+    ]
+    assert [point.id for points in story_uploads for point in points] == [
+        vector_store._qdrant_point_id(story.story_id) for story in stories
+    ]
+
+@pytest.mark.asyncio
+async def test_bulk_load_qdrant_stops_other_pipeline_before_reindexing(sample_user_story, sample_test_cases, qdrant_client):
+    """Test that a failing pipeline lets the other upload finish before indexing is switched back on"""
+    pytest.importorskip("qdrant_client")
+    events = []
+    
+    def slow_upload(collection_name, **kwargs):
+        threading.Event().wait(0.1)
+        events.append(f"uploaded {collection_name}")
+    
+    async def failing_embed(records):
+        await asyncio.sleep(0.02)
+        raise RuntimeError("embedding backend unavailable")
+    
+    qdrant_client.upload_points.side_effect = slow_upload
+    qdrant_client.update_collection.side_effect = lambda collection_name, optimizer_config, hnsw_config: events.append(
+        f"threshold {optimizer_config.indexing_threshold}"
+    )
+    story = sample_user_story.copy(update={"embedding": None})
+    
+    with patch("app.services.vector_store.embed_user_stories", AsyncMock(side_effect=failing_embed)):
+        result = await bulk_load([story], sample_test_cases)
+    
+    assert result is False
+    assert events == [
+        "threshold 0",
+        "threshold 0",
+        "uploaded test_cases",
+        f"threshold {vector_store.QDRANT_INDEXING_THRESHOLD}",
+        f"threshold {vector_store.QDRANT_INDEXING_THRESHOLD}"
+    ]
+
+def test_bulk_load_chunks_fill_parallel_uploads():
+    """Test that a bulk load chunk is large enough to use every upload worker"""
+    assert vector_store.BULK_LOAD_CHUNK_SIZE == (
+        vector_store.QDRANT_UPLOAD_BATCH_SIZE * vector_store.QDRANT_UPLOAD_PARALLEL
+    )
+
+def test_qdrant_point_id_is_deterministic():
+    """Test that Qdrant point IDs are stable 64-bit integers derived from the key"""
+    point_id = vector_store._qdrant_point_id("TEST-VS-001")
+    assert point_id == uuid.uuid5(uuid.NAMESPACE_URL, "TEST-VS-001").int >> 64
+    assert point_id == vector_store._qdrant_point_id("TEST-VS-001")
+    assert point_id != vector_store._qdrant_point_id("TEST-VS-002")
+    assert 0 <= point_id < 2 ** 64
+
+@pytest.mark.asyncio
+async def test_store_user_stories_batches_embeddings(sample_user_story, weaviate_client):
+    """Test that stories without embeddings are embedded with a single batch call"""
+    stories = [
+        sample_user_story.copy(update={"story_id": f"TEST-VS-{i:03d}", "embedding": None})
+        for i in range(50)
+    ]
+    mock_batch_embeddings = AsyncMock(return_value=[[0.1] * 1536 for _ in stories])
+    
+    with patch("app.services.embedding.batch_get_embeddings", mock_batch_embeddings):
+        result = await store_user_stories(stories)
+    
+    assert result is True
+    assert mock_batch_embeddings.await_count == 1
+    assert weaviate_client.batch.__enter__.return_value.add_data_object.call_count == 50
+
+@pytest.mark.asyncio
+async def test_search_similar_user_stories_accepts_float32_array(qdrant_client):
+    """Test that a float32 numpy query is passed through to Qdrant without list conversion"""
+    pytest.importorskip("qdrant_client")
+    query_embedding = np.full(1536, 0.1, dtype=np.float32)
+    qdrant_client.search.return_value = []
+    
+    results = await search_similar_user_stories(query_embedding, limit=2)
+    
+    assert results == []
+    query_vector = qdrant_client.search.call_args.kwargs["query_vector"]
+    assert isinstance(query_vector, np.ndarray)
+    assert query_vector.dtype == np.float32
+
+def test_get_qdrant_client_reuses_pooled_client():
+    """Test that Qdrant clients are pooled per (url, api_key)"""
+    pytest.importorskip("qdrant_client")
+    with patch("qdrant_client.QdrantClient") as mock_client_cls, \
+         patch.dict(vector_store._qdrant_client_pool, clear=True):
+        # A fresh mock per construction, so distinct clients are distinguishable
+        mock_client_cls.side_effect = lambda **kwargs: MagicMock()
+        first = vector_store.get_qdrant_client("http://qdrant:6333", "key")
+        second = vector_store.get_qdrant_client("http://qdrant:6333", "key")
+        other = vector_store.get_qdrant_client("http://qdrant:6333", "other-key")
+    
+    assert first is second
+    assert other is not first
+    assert mock_client_cls.call_count == 2
+    assert mock_client_cls.call_args.kwargs["timeout"] == vector_store.QDRANT_TIMEOUT
+
+def test_qdrant_client_uses_grpc():
+    """Test that the Qdrant client is created with gRPC transport"""
+    pytest.importorskip("qdrant_client")
+    with patch("qdrant_client.QdrantClient") as mock_client_cls, \
+         patch.dict(vector_store._qdrant_client_pool, clear=True):
+        vector_store.get_qdrant_client("http://qdrant:6333")
+    
+    client_kwargs = mock_client_cls.call_args.kwargs
+    assert client_kwargs["prefer_grpc"] is True
+    assert client_kwargs["grpc_port"] == vector_store.QDRANT_GRPC_PORT
+
+def test_get_weaviate_client_reuses_pooled_client():
+    """Test that Weaviate clients are pooled per (url, api_key)"""
+    pytest.importorskip("weaviate")
+    with patch("weaviate.Client") as mock_client_cls, \
+         patch.dict(vector_store._weaviate_client_pool, clear=True):
+        first = vector_store.get_weaviate_client("http://weaviate:8080")
+        second = vector_store.get_weaviate_client("http://weaviate:8080")
+    
+    assert first is second
+    mock_client_cls.assert_called_once()
+    assert mock_client_cls.call_args.kwargs["timeout_config"] == (
+        vector_store.WEAVIATE_CONNECT_TIMEOUT,
+        vector_store.WEAVIATE_READ_TIMEOUT
+    )
+
+@pytest.mark.asyncio
+async def test_search_similar_user_stories_maps_qdrant_hits(sample_user_story, qdrant_client):
+    """Test that Qdrant hits are mapped to records without mutating their payloads"""
+    pytest.importorskip("qdrant_client")
+    payload = sample_user_story.dict(exclude={"embedding"})
+    hits = make_hits(100, payload)
+    qdrant_client.search.return_value = hits
+    
+    results = await search_similar_user_stories([0.1] * 1536, limit=100)
+    
+    assert len(results) == 100
+    assert all(story.story_id == sample_user_story.story_id for story in results)
+    assert all(story.embedding is None for story in results)
+    assert "embedding" not in hits[0].payload
+    assert qdrant_client.search.call_args.kwargs["with_payload"] == list(vector_store._USER_STORY_FIELDS)
+    quantization_params = qdrant_client.search.call_args.kwargs["search_params"].quantization
+    assert quantization_params.rescore is True
+    assert quantization_params.oversampling == vector_store.QDRANT_RESCORE_OVERSAMPLING
+    assert qdrant_client.search.call_args.kwargs["search_params"].hnsw_ef == vector_store.HNSW_EF_SEARCH
+
+@pytest.mark.asyncio
+async def test_gathered_qdrant_searches_run_concurrently(sample_user_story, sample_test_cases, qdrant_client):
+    """Test that gathered searches don't block the event loop while waiting on the client"""
+    pytest.importorskip("qdrant_client")
+    story_payload = sample_user_story.dict(exclude={"embedding"})
+    test_case_payload = sample_test_cases[0].dict(exclude={"embedding"})
+    # Each search only returns once the other one has also reached the client
+    barrier = threading.Barrier(2, timeout=5)
+    
+    def blocking_search(collection_name, **kwargs):
+        barrier.wait()
+        return make_hits(1, story_payload if collection_name == "user_stories" else test_case_payload)
+    
+    qdrant_client.search.side_effect = blocking_search
+    
+    similar_stories, similar_test_cases = await asyncio.gather(
+        search_similar_user_stories([0.1] * 1536, limit=1),
+        search_similar_test_cases([0.2] * 1536, limit=1)
+    )
+    
+    assert [story.story_id for story in similar_stories] == [sample_user_story.story_id]
+    assert [test_case.title for test_case in similar_test_cases] == [sample_test_cases[0].title]
+
+def test_step_serialization_round_trip():
+    """Test that test case steps survive serialization for Weaviate"""
+    step = {"action": "Navigate to the homepage", "expected": "Homepage is displayed with search box"}
+    serialized = vector_store._dumps_step(step)
+    assert isinstance(serialized, str)
+    assert vector_store._loads_step(serialized) == step
+
+@pytest.mark.asyncio
+async def test_search_similar_test_cases_weaviate_reuses_parsed_steps(sample_test_cases, weaviate_client):
+    """Test that repeated Weaviate hits do not parse the same steps again"""
+    item = sample_test_cases[0].dict(exclude={"embedding"})
+    item["steps"] = [vector_store._dumps_step(step) for step in item["steps"]]
+    mock_query = weaviate_client.query.get.return_value.with_near_vector.return_value.with_limit.return_value
+    mock_query.do.side_effect = lambda: {"data": {"Get": {"TestCase": [dict(item)]}}}
+    vector_store._parse_steps.cache_clear()
+    
+    with patch("app.services.vector_store._loads_step", wraps=vector_store._loads_step) as mock_loads:
+        first = await search_similar_test_cases([0.2] * 1536, limit=1)
+        parse_count = mock_loads.call_count
+        second = await search_similar_test_cases([0.2] * 1536, limit=1)
+    
+    assert parse_count == len(sample_test_cases[0].steps)
+    assert mock_loads.call_count == parse_count
+    assert first[0].steps == second[0].steps == sample_test_cases[0].steps
+
+@pytest.mark.asyncio
+async def test_search_similar_user_stories_batch_uses_one_qdrant_request(sample_user_story, qdrant_client):
+    """Test that multiple story queries are sent to Qdrant as one batch request"""
+    pytest.importorskip("qdrant_client")
+    payload = sample_user_story.dict(exclude={"embedding"})
+    qdrant_client.query_batch_points.return_value = [
+        SimpleNamespace(points=make_hits(2, payload)),
+        SimpleNamespace(points=make_hits(1, payload)),
+        SimpleNamespace(points=[])
+    ]
+    
+    results = await search_similar_user_stories_batch(np.full((3, 1536), 0.1, dtype=np.float32), limit=2)
+    
+    qdrant_client.query_batch_points.assert_called_once()
+    qdrant_client.search.assert_not_called()
+    requests = qdrant_client.query_batch_points.call_args.kwargs["requests"]
+    assert len(requests) == 3
+    assert requests[0].params.hnsw_ef == vector_store.HNSW_EF_SEARCH
+    assert [len(stories) for stories in results] == [2, 1, 0]
+
+@pytest.mark.asyncio
+async def test_search_similar_user_stories_batch_overlaps_weaviate_queries(sample_user_story, weaviate_client):
+    """Test that Weaviate batch searches have all their single queries in flight at once"""
+    payload = sample_user_story.dict(exclude={"embedding"})
+    barrier = threading.Barrier(3, timeout=5)
+    
+    def blocking_do():
+        barrier.wait()
+        return {"data": {"Get": {"UserStory": [payload]}}}
+    
+    mock_query = weaviate_client.query.get.return_value.with_near_vector.return_value.with_limit.return_value
+    mock_query.do.side_effect = blocking_do
+    
+    results = await search_similar_user_stories_batch(np.full((3, 1536), 0.1, dtype=np.float32), limit=1)
+    
+    assert [len(stories) for stories in results] == [1, 1, 1]
+
+@pytest.mark.asyncio
+async def test_search_similar_test_cases_batch_uses_one_faiss_search(sample_test_cases):
+    """Test that multiple test case queries are answered with one FAISS search"""
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.zeros((2, 2)), np.array([[1, 0], [0, -1]]))
+    faiss_client = {
+        "dimension": 2,
+        "index": {"user_stories": MagicMock(), "test_cases": mock_index},
+        "user_stories": {},
+        "test_cases": {
+            test_case.test_case_id: test_case.dict(exclude={"embedding"})
+            for test_case in sample_test_cases
+        }
+    }
+    
+    with patch("app.services.vector_store.vector_db_client", faiss_client), \
+         patch("app.services.vector_store.vector_db_config", {"type": "faiss"}):
+        results = await search_similar_test_cases_batch([[1.0, 0.0], [0.0, 2.0]], limit=2)
+    
+    mock_index.search.assert_called_once()
+    assert [[test_case.test_case_id for test_case in row] for row in results] == [
+        [sample_test_cases[1].test_case_id, sample_test_cases[0].test_case_id],
+        [sample_test_cases[0].test_case_id]
+    ]
+
+def test_normalize_rows_produces_unit_vectors():
+    """Test that FAISS vectors are scaled to unit length and zero rows stay finite"""
+    vectors = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+    normalized = vector_store._normalize_rows(vectors)
+    assert normalized.dtype == np.float32
+    assert normalized[0].tolist() == pytest.approx([0.6, 0.8])
+    assert normalized[1].tolist() == [0.0, 0.0]
+
+@pytest.mark.asyncio
+async def test_faiss_search_uses_normalized_query(sample_user_story):
+    """Test that FAISS queries are normalized before the inner-product search"""
+    mock_index = MagicMock()
+    mock_index.search.return_value = (np.array([[1.0]]), np.array([[0]]))
+    faiss_client = {
+        "dimension": 2,
+        "index": {"user_stories": mock_index, "test_cases": MagicMock()},
+        "user_stories": {sample_user_story.story_id: sample_user_story.dict(exclude={"embedding"})},
+        "test_cases": {}
+    }
+    
+    with patch("app.services.vector_store.vector_db_client", faiss_client), \
+         patch("app.services.vector_store.vector_db_config", {"type": "faiss"}):
+        results = await search_similar_user_stories([3.0, 4.0], limit=1)
+    
+    assert [story.story_id for story in results] == [sample_user_story.story_id]
+    query = mock_index.search.call_args.args[0]
+    assert np.linalg.norm(query) == pytest.approx(1.0)
+
 @pytest.mark.asyncio
 async def test_vector_store_with_missing_url():
     """Test vector store functions when URL is not configured"""
@@ -179,13 +825,17 @@ async def test_vector_store_with_missing_url():
         del os.environ["VECTOR_DB_URL"]
     
     try:
+        # Without a URL at import time, no remote client should have been created
+        if not original_url and vector_store.vector_db_config["type"] in ["weaviate", "qdrant"]:
+            assert vector_store.vector_db_client is None
+        
         # Create mock data
         user_story = UserStoryRecord(
             story_id="TEST-MOCK-001",
             project_id="TEST-PROJECT",
             title="Mock User Story",
             description="Mock description",
-            created_at=datetime.datetime.now(),
+            created_at=FROZEN_TIME,
             embedding=[0.1] * 1536
         )
         
@@ -196,7 +846,7 @@ async def test_vector_store_with_missing_url():
             description="Mock description",
             steps=[{"action": "Mock action", "expected": "Mock expected"}],
             test_case_text="Mock text",
-            generated_at=datetime.datetime.now(),
+            generated_at=FROZEN_TIME,
             embedding=[0.2] * 1536
         )
         
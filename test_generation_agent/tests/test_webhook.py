@@ -1,12 +1,14 @@
 """
 Test script for the webhook functionality.
 """
+import copy
 import json
 import os
 import sys
 from pathlib import Path
+import httpx
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
 
 # Add the parent directory to sys.path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -14,54 +16,61 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 # Import the app
 from app.main import app
 
-# Create a test client
-client = TestClient(app)
+@pytest_asyncio.fixture
+async def client():
+    """Create an async test client that calls the app in-process over ASGI"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as test_client:
+        yield test_client
 
-def get_mock_payload():
-    """Load the mock payload from the JSON file"""
+@pytest.fixture(scope="session")
+def mock_payload():
+    """Load the mock payload from the JSON file once per session"""
     mock_file = Path(__file__).resolve().parent / "mock_payload.json"
     with open(mock_file, "r") as f:
         return json.load(f)
 
-def test_health_endpoint():
+@pytest.mark.asyncio
+async def test_health_endpoint(client):
     """Test the health endpoint"""
-    response = client.get("/health")
+    response = await client.get("/health")
     assert response.status_code == 200
     assert response.json()["status"] == "healthy"
 
-def test_root_endpoint():
+@pytest.mark.asyncio
+async def test_root_endpoint(client):
     """Test the root endpoint"""
-    response = client.get("/")
+    response = await client.get("/")
     assert response.status_code == 200
     assert "status" in response.json()
     assert response.json()["status"] == "ok"
 
-def test_mock_webhook_endpoint():
+@pytest.mark.asyncio
+async def test_mock_webhook_endpoint(client, mock_payload):
     """Test the mock webhook endpoint"""
-    payload = get_mock_payload()
-    response = client.post("/api/v1/webhook/mock", json=payload)
+    response = await client.post("/api/v1/webhook/mock", json=mock_payload)
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "received"
     assert "story_id" in data["details"]
     assert data["details"]["story_id"] == "123"
 
-def test_mock_webhook_with_invalid_payload():
+@pytest.mark.asyncio
+async def test_mock_webhook_with_invalid_payload(client):
     """Test the mock webhook endpoint with invalid payload"""
     # Empty payload
-    response = client.post("/api/v1/webhook/mock", json={})
+    response = await client.post("/api/v1/webhook/mock", json={})
     assert response.status_code == 400
     
     # Missing required fields
-    response = client.post("/api/v1/webhook/mock", json={"resource": {}})
+    response = await client.post("/api/v1/webhook/mock", json={"resource": {}})
     assert response.status_code == 400
 
-def test_azure_devops_webhook_endpoint():
+@pytest.mark.asyncio
+async def test_azure_devops_webhook_endpoint(client, mock_payload):
     """Test the Azure DevOps webhook endpoint"""
-    payload = get_mock_payload()
-    
     # Without signature validation in testing
-    response = client.post("/api/v1/webhook/azure-devops", json=payload)
+    response = await client.post("/api/v1/webhook/azure-devops", json=mock_payload)
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "received" or data["status"] == "ignored"
@@ -70,18 +79,20 @@ def test_azure_devops_webhook_endpoint():
         assert "story_id" in data["details"]
         assert data["details"]["story_id"] == "123"
 
-def test_webhook_with_different_event_types():
+@pytest.mark.asyncio
+async def test_webhook_with_different_event_types(client, mock_payload):
     """Test the webhook with different event types"""
-    payload = get_mock_payload()
+    # Copy the shared payload before modifying it
+    payload = copy.deepcopy(mock_payload)
     
     # Test with workitem.updated event
     payload["eventType"] = "workitem.updated"
-    response = client.post("/api/v1/webhook/mock", json=payload)
+    response = await client.post("/api/v1/webhook/mock", json=payload)
     assert response.status_code == 200
     
     # Test with unsupported event type
     payload["eventType"] = "workitem.deleted"
-    response = client.post("/api/v1/webhook/azure-devops", json=payload)
+    response = await client.post("/api/v1/webhook/azure-devops", json=payload)
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "ignored"
@@ -101,14 +101,19 @@ def test_faiss_connection():
         
         print("Testing FAISS setup...")
         
-        # Create a small index
+        # Create a small HNSW index, matching the ANN path used for search
         dimension = 1536
-        index = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexHNSWFlat(dimension, 32)
+        index.hnsw.efConstruction = 200
+        index.hnsw.efSearch = 64
         
         # Add some vectors
         vectors = np.random.random((10, dimension)).astype('float32')
         index.add(vectors)
         
+        # Check that the HNSW graph was built
+        assert index.hnsw.max_level >= 0, "HNSW graph was not built"
+        
         # Check if the index is working
         query = np.random.random((1, dimension)).astype('float32')
         D, I = index.search(query, 3)